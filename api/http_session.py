@@ -0,0 +1,105 @@
+import asyncio
+from typing import Optional
+
+import aiohttp
+
+from config import (
+    logger,
+    HTTP_POOL_LIMIT,
+    HTTP_POOL_LIMIT_PER_HOST,
+    HTTP_DNS_CACHE_TTL,
+    HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_REQUEST_TIMEOUT,
+)
+
+
+class HttpSessionPool:
+    """Общий для процесса aiohttp-сеанс с пулом keep-alive соединений."""
+
+    def __init__(
+            self,
+            limit: int = HTTP_POOL_LIMIT,
+            limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST,
+            dns_cache_ttl: int = HTTP_DNS_CACHE_TTL,
+            keepalive_timeout: float = HTTP_KEEPALIVE_TIMEOUT,
+            request_timeout: float = HTTP_REQUEST_TIMEOUT
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.request_timeout = request_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock = asyncio.Lock()
+        self.stats = {
+            "requests": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+            "dns_cache_hits": 0,
+            "dns_cache_misses": 0,
+        }
+
+    async def start(self) -> aiohttp.ClientSession:
+        """Открывает сеанс, если он ещё не открыт."""
+        async with self._lock:
+            if self._session is None or self._session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    ttl_dns_cache=self.dns_cache_ttl,
+                    use_dns_cache=True,
+                    keepalive_timeout=self.keepalive_timeout,
+                )
+                self._session = aiohttp.ClientSession(
+                    connector=connector,
+                    timeout=aiohttp.ClientTimeout(total=self.request_timeout),
+                    trace_configs=[self._build_trace_config()],
+                )
+                logger.info(
+                    f"🌐 HTTP-пул открыт (limit={self.limit}, per_host={self.limit_per_host}, "
+                    f"dns_ttl={self.dns_cache_ttl}s, keepalive={self.keepalive_timeout}s)"
+                )
+            return self._session
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Возвращает открытый сеанс, открывая его при первом обращении."""
+        if self._session is None or self._session.closed:
+            return await self.start()
+        return self._session
+
+    async def close(self):
+        """Закрывает сеанс и все соединения пула."""
+        async with self._lock:
+            if self._session is not None and not self._session.closed:
+                await self._session.close()
+                logger.info(f"🌐 HTTP-пул закрыт. Статистика: {self.stats}")
+            self._session = None
+
+    def _build_trace_config(self) -> aiohttp.TraceConfig:
+        """Счётчики открытия и переиспользования соединений."""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            self.stats["requests"] += 1
+
+        async def on_connection_create_end(session, ctx, params):
+            self.stats["connections_created"] += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            self.stats["connections_reused"] += 1
+
+        async def on_dns_cache_hit(session, ctx, params):
+            self.stats["dns_cache_hits"] += 1
+
+        async def on_dns_cache_miss(session, ctx, params):
+            self.stats["dns_cache_misses"] += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace_config
+
+
+session_pool = HttpSessionPool()
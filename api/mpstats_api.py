@@ -1,13 +1,62 @@
+import asyncio
+import json
+import random
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Optional
+
 import aiohttp
 from dotenv import load_dotenv
-from config import logger, BASE_URL, MAX_PAGE_SIZE, MPSTATS_API_TOKEN
+
+from api.http_session import session_pool
+from api.mpstats_module import ProductBatch, decode_category_page
+from api.rate_limiter import mpstats_rate_limiter
+from api.response_cache import ResponseCache, response_cache
+from api.single_flight import SingleFlight
+from config import (
+    logger,
+    BASE_URL,
+    MAX_PAGE_SIZE,
+    MAX_PAGE_CONCURRENCY,
+    MPSTATS_API_TOKEN,
+    MPSTATS_MAX_RETRIES,
+    MPSTATS_BACKOFF_BASE,
+    MPSTATS_BACKOFF_MAX,
+)
+from utils.cpu_pool import cpu_pool
 
 load_dotenv()
 
+# Общий для всех экземпляров MpstatsAPI реестр запросов «в полёте»
+category_flights = SingleFlight()
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class MpstatsAPIError(Exception):
+    """Запрос к MPStats не удался даже после повторов."""
+
+
 class MpstatsAPI:
-    def __init__(self, token: str = MPSTATS_API_TOKEN, base_url: str = BASE_URL):
+    def __init__(
+            self,
+            token: str = MPSTATS_API_TOKEN,
+            base_url: str = BASE_URL,
+            pool=session_pool,
+            cache=response_cache,
+            flights=category_flights,
+            rate_limiter=mpstats_rate_limiter,
+            cpu=cpu_pool
+    ):
         self.token = token
         self.base_url = base_url
+        self.pool = pool
+        self.cache = cache
+        self.flights = flights
+        self.rate_limiter = rate_limiter
+        self.cpu = cpu
         self.headers = {
             "X-Mpstats-TOKEN": self.token,
             "Content-Type": "application/json"
@@ -15,115 +64,210 @@ class MpstatsAPI:
 
     async def get_categories(self) -> list:
         """Получает список всех категорий Wildberries с MPStats."""
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(
-                    f"{self.base_url}/wb/get/categories",
-                    headers=self.headers
-                ) as response:
-                    response.raise_for_status()
-                    data = await response.json()
-                    logger.info(f"Загружено {len(data)} категорий.")
-                    return data
-            except Exception as e:
-                logger.error(f"Ошибка при получении категорий mpstats.io: {e}")
-                return []
-
-    async def get_category_total(
-            self,
-            d1: str,
-            d2: str,
-            category_path: str,
-            revenue_min: int = None,
-            turnover_days_max: int = None
-    ) -> int:
-        """Возвращает total товаров в категории без пагинации, используя тот же payload, что и get_category_data."""
-        filter_model = {}
-        if revenue_min is not None:
-            filter_model["revenue"] = {"filterType": "number", "type": "greaterThan", "filter": revenue_min}
-        if turnover_days_max is not None:
-            filter_model["turnover_days"] = {"filterType": "number", "type": "lessThan", "filter": turnover_days_max}
-
-        payload = {
-            "startRow": 0,
-            "endRow": 10,
-            "filterModel": filter_model,
-            "sortModel": [{"colId": "revenue", "sort": "desc"}]
-        }
-
-        params = {"d1": d1, "d2": d2, "path": category_path}
+        try:
+            data = json.loads(await self._request("GET", "/wb/get/categories"))
+            logger.info(f"Загружено {len(data)} категорий.")
+            return data
+        except Exception as e:
+            logger.error(f"Ошибка при получении категорий mpstats.io: {e}")
+            return []
 
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(
-                        f"{self.base_url}/wb/get/category",
-                        headers=self.headers,
-                        params=params,
-                        json=payload
-                ) as response:
-                    response.raise_for_status()
-                    data = await response.json()
-                    total = data.get("total", 0)
-                    return int(total)
-            except Exception as e:
-                logger.error(f"Ошибка запроса mpstats.io: {e}")
-                return 0
-
-    async def get_category_data(
+    async def open_category(
         self,
         d1: str,
         d2: str,
         category_path: str,
         revenue_min: int = None,
         turnover_days_max: int = None
-    ) -> list:
-        """Получение всех товаров категории с фильтрацией на стороне API."""
-        all_items = []
-        start = 0
+    ) -> "CategoryDownload":
+        """
+        Запрашивает первую страницу категории и возвращает загрузку с уже известным total.
+        По total вызывающий проверяет лимиты, а CategoryDownload.pages продолжает со второй страницы.
+        """
+        params = {"d1": d1, "d2": d2, "path": category_path}
+        data = await self._fetch_page(params, 0, MAX_PAGE_SIZE, revenue_min, turnover_days_max)
+        return CategoryDownload(self, params, revenue_min, turnover_days_max, data)
 
-        # Формируем filterModel на основе переданных параметров
+    async def _fetch_page(
+            self,
+            params: dict,
+            start: int,
+            end: int,
+            revenue_min: int = None,
+            turnover_days_max: int = None
+    ) -> dict:
+        """
+        Запрашивает одно окно startRow/endRow категории.
+        Одновременные запросы одного и того же окна объединяются в одну загрузку.
+        """
+        payload = self._build_payload(start, end, revenue_min, turnover_days_max)
+        key = ResponseCache.make_key("/wb/get/category", params, payload)
+        return await self.flights.do(key, lambda: self._load_page(params, payload, key))
+
+    async def _load_page(self, params: dict, payload: dict, key: str) -> dict:
+        """Загружает окно категории из кэша ответов или из API."""
+        start, end = payload["startRow"], payload["endRow"]
+
+        if self.cache:
+            body = await asyncio.to_thread(self.cache.get, key)
+            if body is not None:
+                logger.info(f"Категория из кэша: start={start}, end={end}")
+                try:
+                    return await self._decode_page(body)
+                except MpstatsAPIError as e:
+                    logger.warning(f"Ответ из кэша не разобран, запрашиваем заново: {e}")
+
+        logger.info(f"Запрос категории: start={start}, end={end}")
+        body = await self._request("POST", "/wb/get/category", params=params, json=payload)
+
+        # В кэш попадает только успешно разобранный ответ
+        data = await self._decode_page(body)
+        if self.cache and "total" in data:
+            await asyncio.to_thread(self.cache.put, key, body)
+        return data
+
+    async def _decode_page(self, body: bytes) -> dict:
+        """
+        Разбор страницы (JSON и сборка ProductBatch) — самый тяжёлый по CPU этап,
+        поэтому он выполняется в CPU-пуле: туда уходят байты ответа, обратно — массивы NumPy.
+        Если ответ не разбирается, выбрасывает MpstatsAPIError: страница не подменяется пустой.
+        """
+        try:
+            return await self.cpu.run(decode_category_page, body)
+        except BrokenProcessPool:
+            # Сбой пула, а не ответа: CpuPool уже пересоздал пул и повторил разбор
+            raise
+        except Exception as e:
+            raise MpstatsAPIError(f"/wb/get/category: не удалось разобрать ответ: {type(e).__name__}: {e}") from e
+
+    async def _request(self, method: str, endpoint: str, **kwargs) -> bytes:
+        """
+        Выполняет запрос с учётом лимита частоты эндпоинта.
+        На 429/5xx и сетевых ошибках повторяет запрос с экспоненциальной задержкой и jitter,
+        соблюдая Retry-After. Если сервер просит ждать дольше MPSTATS_BACKOFF_MAX, сразу выбрасывает
+        MpstatsAPIError: иначе воркер очереди и все ждущие этот запрос простаивали бы вместе с ним.
+        Возвращает тело ответа.
+        """
+        session = await self.pool.get_session()
+        url = f"{self.base_url}{endpoint}"
+
+        for attempt in range(MPSTATS_MAX_RETRIES + 1):
+            await self.rate_limiter.acquire(endpoint)
+            retry_after = None
+            try:
+                async with session.request(method, url, headers=self.headers, **kwargs) as response:
+                    if response.status not in RETRY_STATUSES:
+                        response.raise_for_status()
+                        return await response.read()
+                    retry_after = self._parse_retry_after(response.headers.get("Retry-After"))
+                    error = f"HTTP {response.status}"
+            except aiohttp.ClientResponseError as e:
+                raise MpstatsAPIError(f"{endpoint}: HTTP {e.status} {e.message}") from e
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = f"{type(e).__name__}: {e}"
+
+            if attempt == MPSTATS_MAX_RETRIES:
+                raise MpstatsAPIError(f"{endpoint}: {error} (попыток: {attempt + 1})")
+
+            if retry_after is not None and retry_after > MPSTATS_BACKOFF_MAX:
+                raise MpstatsAPIError(f"{endpoint}: {error}, сервер просит повторить через {retry_after:.0f} с")
+            delay = retry_after if retry_after is not None else self._backoff_delay(attempt)
+            logger.warning(f"mpstats.io {endpoint}: {error}, повтор через {delay:.1f} с (попытка {attempt + 1})")
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _backoff_delay(attempt: int) -> float:
+        """Экспоненциальная задержка с полным jitter."""
+        return random.uniform(0, min(MPSTATS_BACKOFF_MAX, MPSTATS_BACKOFF_BASE * 2 ** attempt))
+
+    @staticmethod
+    def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """Retry-After бывает числом секунд или HTTP-датой."""
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+    @staticmethod
+    def _build_payload(start: int, end: int, revenue_min: int = None, turnover_days_max: int = None) -> dict:
+        """Формирует тело запроса /wb/get/category с фильтрами и сортировкой по выручке."""
         filter_model = {}
         if revenue_min is not None:
             filter_model["revenue"] = {"filterType": "number", "type": "greaterThan", "filter": revenue_min}
         if turnover_days_max is not None:
             filter_model["turnover_days"] = {"filterType": "number", "type": "lessThan", "filter": turnover_days_max}
 
-        async with aiohttp.ClientSession() as session:
-            while True:
-                payload = {
-                    "startRow": start,
-                    "endRow": start + MAX_PAGE_SIZE,
-                    "filterModel": filter_model,  # добавили фильтры
-                    "sortModel": [{"colId": "revenue", "sort": "desc"}]  # сортировка по выручке
-                }
+        return {
+            "startRow": start,
+            "endRow": end,
+            "filterModel": filter_model,
+            "sortModel": [{"colId": "revenue", "sort": "desc"}]  # сортировка по выручке
+        }
 
-                params = {"d1": d1, "d2": d2, "path": category_path}
 
-                logger.info(f"Запрос категории: start={start}, end={start + MAX_PAGE_SIZE}")
+class CategoryDownload:
+    """Начатая загрузка категории: первая страница и total уже получены, остальные окна догружаются в pages()."""
 
-                try:
-                    async with session.post(
-                        f"{self.base_url}/wb/get/category",
-                        headers=self.headers,
-                        params=params,
-                        json=payload
-                    ) as response:
-                        response.raise_for_status()
-                        data = await response.json()
+    def __init__(self, api: MpstatsAPI, params: dict, revenue_min: int, turnover_days_max: int, first_page: dict):
+        self.api = api
+        self.params = params
+        self.revenue_min = revenue_min
+        self.turnover_days_max = turnover_days_max
+        self.total = int(first_page.get("total", 0))
+        self.first_batch = first_page["data"]
+
+    async def pages(self, concurrency: int = MAX_PAGE_CONCURRENCY) -> AsyncIterator[ProductBatch]:
+        """
+        Отдаёт страницы в порядке sortModel, начиная с уже загруженной первой.
+        Следующие окна запрашиваются заранее, но в памяти одновременно держится не больше concurrency страниц.
+        Если окно не удалось загрузить после повторов, выбрасывает MpstatsAPIError:
+        неполный отчёт хуже, чем явная ошибка.
+        """
+        batch, self.first_batch = self.first_batch, ProductBatch.empty()
+        total = self.total
+        loaded = len(batch)
+        logger.info(f"Загружено {loaded} из {total} товаров...")
+        yield batch
 
-                        items = data.get("data", [])
-                        total = data.get("total", 0)
+        if loaded >= total or loaded < MAX_PAGE_SIZE:
+            return  # все данные получены
 
-                        all_items.extend(items)
-                        logger.info(f"Загружено {len(all_items)} из {total} товаров...")
+        starts = iter(range(MAX_PAGE_SIZE, total, MAX_PAGE_SIZE))
+        pending = deque()
 
-                        if len(all_items) >= total or not items:
-                            break  # все данные получены
+        def schedule_next():
+            start = next(starts, None)
+            if start is not None:
+                task = asyncio.create_task(self.api._fetch_page(
+                    self.params, start, start + MAX_PAGE_SIZE, self.revenue_min, self.turnover_days_max
+                ))
+                pending.append((start, task))
 
-                        start += MAX_PAGE_SIZE
+        try:
+            for _ in range(max(1, concurrency)):
+                schedule_next()
 
-                except Exception as e:
-                    logger.error(f"Ошибка запроса mpstats.io: {e}")
-                    break
+            # Ждём окна строго по порядку, поэтому сортировка по выручке не нарушается
+            while pending:
+                start, task = pending.popleft()
+                data = await task
 
-        return all_items
+                batch = data["data"]
+                if not len(batch):
+                    return
+                loaded += len(batch)
+                logger.info(f"Загружено {loaded} из {total} товаров...")
+                schedule_next()
+                yield batch
+        finally:
+            for _, task in pending:
+                task.cancel()
@@ -1,41 +1,220 @@
-from typing import List
-
-from config import logger
-
-class Product:
-    def __init__(self, data: dict):
-        self.raw_data = data
-        self.id = data.get('nm_id', data.get('id', data.get('barcode')))
-        self.name = data.get('name', 'Без названия')
-        self.revenue = data.get('revenue', 0)
-        self.turnover_days = data.get('turnover_days', 0)
-        self.sku_first_date = data.get('sku_first_date', 0)
-        self.stocks_graph = data.get('stocks_graph', [])
-        logger.debug(f"Создан продукт: {self.id}")
-
-    def _parse_nested_value(self, key: str, data: dict):
-        """Рекурсивный поиск значения в данных"""
-        for k, v in data.items():
-            if k == key:
-                return v
-            if isinstance(v, dict):
-                found = self._parse_nested_value(key, v)
-                if found is not None:
-                    return found
-            elif isinstance(v, list):
-                for item in v:
-                    if isinstance(item, dict):
-                        found = self._parse_nested_value(key, item)
-                        if found is not None:
-                            return found
-        return None
+import json
+from datetime import datetime
+from itertools import chain
+from typing import List, Sequence
+
+import numpy as np
+
+from config import logger, DATE_FORMAT
+
+_MISSING = object()
+
+# Поля товара, которые нужны отчёту: атрибут -> пути в ответе MPStats (по приоритету) и значение по умолчанию.
+# Путь может быть вложенным: "a.b.c". Всё остальное из ответа не сохраняется.
+PRODUCT_FIELDS = {
+    "id": (("nm_id", "id", "barcode"), None),
+    "name": (("name",), "Без названия"),
+    "revenue": (("revenue",), 0),
+    "turnover_days": (("turnover_days",), 0),
+    "sku_first_date": (("sku_first_date",), 0),
+    "stocks_graph": (("stocks_graph",), None),
+}
+
+NO_DATE = np.datetime64("NaT", "D")
+
+
+def compile_fields(fields: dict) -> dict:
+    """
+    Разбирает спецификацию полей один раз: атрибут -> (ключ, пути, значение по умолчанию).
+    Поле с единственным путём без точки читается одним dict.get по ключу; иначе ключ None,
+    а пути — строки для dict.get или кортежи ключей для вложенных значений.
+    """
+    compiled = {}
+    for attr, (paths, default) in fields.items():
+        parsed = tuple(tuple(path.split(".")) if "." in path else path for path in paths)
+        key = parsed[0] if len(parsed) == 1 and isinstance(parsed[0], str) else None
+        compiled[attr] = (key, parsed, default)
+    return compiled
+
+
+COMPILED_PRODUCT_FIELDS = compile_fields(PRODUCT_FIELDS)
+
+
+def extract_field(data: dict, keys: tuple, default=_MISSING):
+    """Достаёт значение по разобранному пути ("a", "b", "c"); если пути нет — default."""
+    value = data
+    for key in keys:
+        if not isinstance(value, dict) or key not in value:
+            return default
+        value = value[key]
+    return value
+
+
+def extract_column(items: Sequence[dict], field: tuple) -> list:
+    """Значения одного поля (см. compile_fields) по всем товарам: берётся первый существующий путь."""
+    key, paths, default = field
+    if key is not None:
+        return [item.get(key, default) for item in items]
+
+    column = []
+    for item in items:
+        value = default
+        for path in paths:
+            found = item.get(path, _MISSING) if path.__class__ is str else extract_field(item, path)
+            if found is not _MISSING:
+                value = found
+                break
+        column.append(value)
+    return column
+
+
+def parse_sku_date(value) -> np.datetime64:
+    """Дата первого SKU; пустое или нераспознанное значение — NaT (такие товары фильтр не отсекает)."""
+    if not value:
+        return NO_DATE
+    try:
+        return np.datetime64(datetime.strptime(value, DATE_FORMAT).date(), "D")
+    except Exception:
+        return NO_DATE
+
+
+class ProductBatch:
+    """
+    Колоночное представление товаров страницы MPStats.
+    Числовые поля — массивы NumPy, графики остатков — общий буфер значений
+    stocks_values со смещениями stocks_offsets (график товара i — values[offsets[i]:offsets[i + 1]]).
+    """
+
+    def __init__(
+            self,
+            ids: np.ndarray,
+            names: np.ndarray,
+            revenue: np.ndarray,
+            turnover_days: np.ndarray,
+            sku_first_date: np.ndarray,
+            stocks_values: np.ndarray,
+            stocks_offsets: np.ndarray
+    ):
+        self.ids = ids
+        self.names = names
+        self.revenue = revenue
+        self.turnover_days = turnover_days
+        self.sku_first_date = sku_first_date
+        self.stocks_values = stocks_values
+        self.stocks_offsets = stocks_offsets
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def empty(cls) -> "ProductBatch":
+        return cls.from_items([])
+
+    @classmethod
+    def from_items(cls, items: Sequence[dict]) -> "ProductBatch":
+        """Строит колонки из сырых товаров ответа API, оставляя только поля PRODUCT_FIELDS."""
+        fields = COMPILED_PRODUCT_FIELDS
+        # Поля извлекаются по столбцам: один проход по товарам на поле, без промежуточного словаря на товар
+        revenue = [value or 0 for value in extract_column(items, fields["revenue"])]
+        turnover_days = [value or 0 for value in extract_column(items, fields["turnover_days"])]
+
+        parsed_dates = {}
+        sku_dates = []
+        for sku_date in extract_column(items, fields["sku_first_date"]):
+            if isinstance(sku_date, str):
+                parsed = parsed_dates.get(sku_date)
+                if parsed is None:
+                    parsed = parsed_dates[sku_date] = parse_sku_date(sku_date)
+            else:
+                parsed = parse_sku_date(sku_date)
+            sku_dates.append(parsed)
+
+        graphs = [graph or () for graph in extract_column(items, fields["stocks_graph"])]
+        offsets = np.zeros(len(graphs) + 1, dtype=np.int64)
+        np.cumsum([len(graph) for graph in graphs], out=offsets[1:])
+
+        return cls(
+            ids=np.array(extract_column(items, fields["id"]), dtype=object),
+            names=np.array(extract_column(items, fields["name"]), dtype=object),
+            revenue=np.array(revenue, dtype=np.float64),
+            turnover_days=np.array(turnover_days, dtype=np.float64),
+            sku_first_date=np.array(sku_dates, dtype="datetime64[D]"),
+            # пропуски (null) в графике становятся NaN и никогда не считаются падением
+            stocks_values=np.array(list(chain.from_iterable(graphs)), dtype=np.float64),
+            stocks_offsets=offsets,
+        )
+
+    @classmethod
+    def concat(cls, batches: List["ProductBatch"]) -> "ProductBatch":
+        """Склеивает несколько батчей в один с сохранением порядка."""
+        if not batches:
+            return cls.empty()
+        offsets = [batches[0].stocks_offsets]
+        shift = batches[0].stocks_offsets[-1]
+        for batch in batches[1:]:
+            offsets.append(batch.stocks_offsets[1:] + shift)
+            shift += batch.stocks_offsets[-1]
+        return cls(
+            ids=np.concatenate([b.ids for b in batches]),
+            names=np.concatenate([b.names for b in batches]),
+            revenue=np.concatenate([b.revenue for b in batches]),
+            turnover_days=np.concatenate([b.turnover_days for b in batches]),
+            sku_first_date=np.concatenate([b.sku_first_date for b in batches]),
+            stocks_values=np.concatenate([b.stocks_values for b in batches]),
+            stocks_offsets=np.concatenate(offsets),
+        )
+
+    def take(self, indices: np.ndarray) -> "ProductBatch":
+        """Новый батч из товаров с указанными индексами (порядок сохраняется)."""
+        indices = np.asarray(indices, dtype=np.int64)
+        starts = self.stocks_offsets[indices]
+        lengths = self.stocks_offsets[indices + 1] - starts
+
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # Индексы значений графиков выбранных товаров одним вектором
+        positions = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+
+        return ProductBatch(
+            ids=self.ids[indices],
+            names=self.names[indices],
+            revenue=self.revenue[indices],
+            turnover_days=self.turnover_days[indices],
+            sku_first_date=self.sku_first_date[indices],
+            stocks_values=self.stocks_values[positions],
+            stocks_offsets=offsets,
+        )
+
+    def without_stocks(self) -> "ProductBatch":
+        """Тот же батч без графиков остатков — для хранения того, что нужно только строкам отчёта."""
+        return ProductBatch(
+            ids=self.ids,
+            names=self.names,
+            revenue=self.revenue,
+            turnover_days=self.turnover_days,
+            sku_first_date=self.sku_first_date,
+            stocks_values=np.empty(0, dtype=np.float64),
+            stocks_offsets=np.zeros(len(self) + 1, dtype=np.int64),
+        )
+
+    def stocks_graph(self, i: int) -> np.ndarray:
+        return self.stocks_values[self.stocks_offsets[i]:self.stocks_offsets[i + 1]]
 
 
 class MpstatsData:
     def __init__(self, raw_data: list):
-        self.products: List[Product] = []
-        try:
-            self.products = [Product(item) for item in raw_data]
-            logger.info(f"Обработано продуктов: {len(self.products)}")
-        except Exception as e:
-            logger.error(f"Ошибка парсинга данных: {str(e)}")
\ No newline at end of file
+        # Ошибка разбора не глотается: пустой батч выглядел бы как конец данных и обрезал отчёт
+        self.products = ProductBatch.from_items(raw_data)
+        logger.info(f"Обработано продуктов: {len(self.products)}")
+
+
+def decode_category_page(body: bytes) -> dict:
+    """
+    Разбирает ответ /wb/get/category и сразу переводит товары в колоночный ProductBatch,
+    чтобы сырые словари не доживали до очереди страниц и общих результатов.
+    Функция модульного уровня: выполняется в CPU-пуле, в том числе в отдельном процессе.
+    Некорректный ответ (JSON или значения полей) приводит к исключению.
+    """
+    data = json.loads(body)
+    data["data"] = MpstatsData(data.get("data") or []).products
+    return data
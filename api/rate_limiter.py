@@ -0,0 +1,49 @@
+import asyncio
+import time
+from typing import Dict, Tuple
+
+from config import MPSTATS_RATE_LIMITS
+
+
+class TokenBucket:
+    """Token bucket: не больше rate запросов в секунду в среднем и не больше burst подряд."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Ждёт, пока в ведре появится токен, и забирает его (очередь FIFO)."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """Набор token bucket по эндпоинтам; неизвестные эндпоинты делят общее ведро default."""
+
+    def __init__(self, limits: Dict[str, Tuple[float, int]] = MPSTATS_RATE_LIMITS):
+        self.limits = limits
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def bucket(self, endpoint: str) -> TokenBucket:
+        name = endpoint if endpoint in self.limits else "default"
+        if name not in self._buckets:
+            rate, burst = self.limits[name]
+            self._buckets[name] = TokenBucket(rate, burst)
+        return self._buckets[name]
+
+    async def acquire(self, endpoint: str):
+        await self.bucket(endpoint).acquire()
+
+
+mpstats_rate_limiter = RateLimiter()
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from config import logger, MPSTATS_CACHE_DB, MPSTATS_CACHE_MAX_BYTES, MPSTATS_REFRESH_HOUR
+
+
+def next_mpstats_refresh(now: float, refresh_hour: int = MPSTATS_REFRESH_HOUR) -> float:
+    """Момент ближайшего ежедневного обновления данных MPStats (до него кэшированные данные актуальны)."""
+    current = datetime.fromtimestamp(now)
+    refresh = current.replace(hour=refresh_hour, minute=0, second=0, microsecond=0)
+    if refresh <= current:
+        refresh += timedelta(days=1)
+    return refresh.timestamp()
+
+
+def evict_lru(
+        conn: sqlite3.Connection,
+        table: str,
+        max_bytes: int,
+        evict: Callable[[str], None],
+        where: str = "1"
+) -> tuple:
+    """
+    Вытесняет из таблицы с колонками key, size, last_access давно не читанные записи, пока сумма size
+    строк, подходящих под where, не влезет в max_bytes. Само вытеснение записи делает evict(key).
+    Возвращает (итоговый размер, число вытесненных записей). table и where — константы вызывающего кода.
+    """
+    total = conn.execute(f'SELECT COALESCE(SUM(size), 0) FROM {table} WHERE {where}').fetchone()[0]
+    evicted = 0
+    if total <= max_bytes:
+        return total, evicted
+
+    rows = conn.execute(f'SELECT key, size FROM {table} WHERE {where} ORDER BY last_access').fetchall()
+    for key, size in rows:
+        if total <= max_bytes:
+            break
+        evict(key)
+        total -= size
+        evicted += 1
+    return total, evicted
+
+
+class ResponseCache:
+    """
+    Персистентный кэш ответов MPStats в SQLite.
+    Тела ответов хранятся сжатыми, истекают в момент ежедневного обновления данных MPStats,
+    при превышении max_bytes вытесняются давно не читанные записи (LRU).
+    """
+
+    def __init__(
+            self,
+            db_path: str = MPSTATS_CACHE_DB,
+            max_bytes: int = MPSTATS_CACHE_MAX_BYTES,
+            refresh_hour: int = MPSTATS_REFRESH_HOUR
+    ):
+        self.max_bytes = max_bytes
+        self.refresh_hour = refresh_hour
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._create_table()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "writes": 0}
+
+    def _create_table(self):
+        with self.conn:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            ''')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)')
+
+    @staticmethod
+    def make_key(endpoint: str, params: dict, payload: dict = None) -> str:
+        """Ключ по точным параметрам запроса и телу."""
+        raw = json.dumps([endpoint, params, payload], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Возвращает тело ответа или None, если записи нет или она устарела."""
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT value, expires_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+
+            value, expires_at = row
+            if expires_at <= now:
+                with self.conn:
+                    self.conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+
+            with self.conn:
+                self.conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, key))
+            self.stats["hits"] += 1
+
+        return zlib.decompress(value)
+
+    def put(self, key: str, body: bytes):
+        """Сохраняет тело ответа до ближайшего обновления данных MPStats."""
+        value = zlib.compress(body)
+        if len(value) > self.max_bytes:
+            return
+
+        now = time.time()
+        with self._lock:
+            with self.conn:
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO responses (key, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)',
+                    (key, value, len(value), next_mpstats_refresh(now, self.refresh_hour), now)
+                )
+            self.stats["writes"] += 1
+            self._evict(now)
+
+    def hit_ratio(self) -> float:
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
+
+    def _evict(self, now: float):
+        """Удаляет устаревшие записи и вытесняет LRU, пока кэш не влезет в max_bytes."""
+        with self.conn:
+            self.conn.execute('DELETE FROM responses WHERE expires_at <= ?', (now,))
+            total, evicted = evict_lru(
+                self.conn, "responses", self.max_bytes,
+                lambda key: self.conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+            )
+        if evicted:
+            self.stats["evictions"] += evicted
+            logger.info(f"🗄 Кэш MPStats ужат до {total} байт ({self.stats['evictions']} вытеснений всего)")
+
+
+response_cache = ResponseCache()
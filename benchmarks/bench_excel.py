@@ -0,0 +1,85 @@
+"""
+Бенчмарк записи отчёта в xlsx: прежний ExcelBuilder (pandas DataFrame + iterrows + write на каждую ячейку)
+против потоковой записи строк в режиме constant_memory.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_excel
+"""
+import time
+import tracemalloc
+from io import BytesIO
+
+import pandas as pd
+
+from feature.excel.excel_builder import ExcelBuilder
+from feature.mpstats.mpstats_reports import MpstatsExcelReport
+
+SIZES = (10_000, 30_000, 100_000)
+START_DATE, END_DATE = "2025-09-01", "2025-09-30"
+
+
+def make_rows(n: int) -> list:
+    return [
+        MpstatsExcelReport._product_to_row(i, 100_000 + i, f"Товар {i}", 1_000_000 - i, i % 60, START_DATE, END_DATE)
+        for i in range(1, n + 1)
+    ]
+
+
+def legacy_build(df: pd.DataFrame, sheet_name: str, columns_config: dict) -> BytesIO:
+    """Прежняя реализация ExcelBuilder.build."""
+    output = BytesIO()
+    chunk_size = 5000
+
+    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
+        workbook = writer.book
+        worksheet = workbook.add_worksheet(sheet_name)
+        writer.sheets[sheet_name] = worksheet
+
+        for col_idx, col_name in enumerate(df.columns):
+            worksheet.write(0, col_idx, col_name)
+            col_letter = chr(65 + col_idx)
+            if col_letter in columns_config:
+                worksheet.set_column(f"{col_letter}:{col_letter}", columns_config[col_letter])
+
+        row_offset = 1
+        for start in range(0, len(df), chunk_size):
+            df_chunk = df.iloc[start:start + chunk_size]
+            for i, (_, row) in enumerate(df_chunk.iterrows()):
+                for j, col in enumerate(df.columns):
+                    value = row[col]
+                    if col in ("Ссылка WB", "MPStats") and isinstance(value, str) and value.startswith("http"):
+                        worksheet.write_url(row_offset + i, j, value, string=value)
+                    else:
+                        worksheet.write(row_offset + i, j, value)
+            row_offset += len(df_chunk)
+
+    output.seek(0)
+    return output
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    started = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024
+
+
+def main():
+    columns = MpstatsExcelReport.REPORT_COLUMNS
+    columns_config = MpstatsExcelReport._get_columns_config()
+    builder = ExcelBuilder("Товары")
+
+    print(f"{'строк':>8} {'старый, с':>10} {'новый, с':>10} {'ускорение':>10} {'старый, МБ':>11} {'новый, МБ':>10}")
+    for n in SIZES:
+        rows = make_rows(n)
+        df = pd.DataFrame(rows, columns=columns)
+        legacy_time, legacy_peak = measure(legacy_build, df, "Товары", columns_config)
+        new_time, new_peak = measure(builder.build, rows, columns, columns_config)
+        print(f"{n:>8} {legacy_time:>10.2f} {new_time:>10.2f} {legacy_time / new_time:>9.1f}x {legacy_peak:>11.1f} {new_peak:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
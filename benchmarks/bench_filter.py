@@ -0,0 +1,130 @@
+"""
+Бенчмарк фильтра товаров отчёта: прежний построчный цикл против векторного ProductFilter.
+Итоговое ускорение учитывает и разбор товаров: прежние объекты Product против сборки ProductBatch.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_filter
+"""
+import random
+import time
+from datetime import datetime
+
+from api.mpstats_module import ProductBatch
+from feature.mpstats.product_filter import ProductFilter
+
+SIZES = (10_000, 100_000, 500_000)
+GRAPH_POINTS = 30
+PARAMS = dict(turnover_days_max=30, revenue_min=300_000, start_date="2025-09-01", end_date="2025-09-30")
+DROP_THRESHOLD = 20.0
+
+
+def make_stocks_graph(rnd: random.Random) -> list:
+    """Остатки плавно меняются день ко дню, у части товаров бывает резкое падение."""
+    value = rnd.randint(50, 500)
+    graph = []
+    for _ in range(GRAPH_POINTS):
+        graph.append(value)
+        if rnd.random() < 0.01:
+            value = int(value * rnd.uniform(0.3, 0.7))
+        else:
+            value = max(0, value + rnd.randint(-value // 20 - 1, value // 20 + 1))
+    return graph
+
+
+def make_items(n: int, seed: int = 42) -> list:
+    rnd = random.Random(seed)
+    dates = [0, "2025-09-15", "2025-08-01", "2025-09-30"]
+    return [
+        {
+            "id": i,
+            "name": f"Товар {i}",
+            "revenue": rnd.randint(0, 2_000_000),
+            "turnover_days": rnd.randint(0, 90),
+            "sku_first_date": rnd.choice(dates),
+            "stocks_graph": make_stocks_graph(rnd),
+        }
+        for i in range(n)
+    ]
+
+
+class LegacyProduct:
+    """Прежний api.mpstats_module.Product: объект со словарным доступом к полям на каждый товар."""
+
+    def __init__(self, data: dict):
+        self.raw_data = data
+        self.id = data.get("nm_id", data.get("id", data.get("barcode")))
+        self.name = data.get("name", "Без названия")
+        self.revenue = data.get("revenue", 0)
+        self.turnover_days = data.get("turnover_days", 0)
+        self.sku_first_date = data.get("sku_first_date", 0)
+        self.stocks_graph = data.get("stocks_graph", [])
+
+
+def legacy_products(items: list) -> list:
+    return [LegacyProduct(item) for item in items]
+
+
+def legacy_filter(items: list, turnover_days_max, revenue_min, start_date, end_date, drop_threshold_percent) -> list:
+    """Прежняя реализация MpstatsExcelReport._filter_products (построчно, по словарям товаров)."""
+    start_dt = datetime.strptime(start_date, "%Y-%m-%d")
+    end_dt = datetime.strptime(end_date, "%Y-%m-%d")
+
+    def has_sharp_drop(stocks_graph) -> bool:
+        if not stocks_graph or len(stocks_graph) < 2:
+            return False
+        for i in range(len(stocks_graph) - 1):
+            current = stocks_graph[i]
+            next_val = stocks_graph[i + 1]
+            if current == 0:
+                continue
+            if (current - next_val) / current * 100 >= drop_threshold_percent:
+                return True
+        return False
+
+    filtered = []
+    for p in items:
+        if (p["turnover_days"] or 0) >= turnover_days_max or (p["revenue"] or 0) <= revenue_min:
+            continue
+        if p["sku_first_date"]:
+            try:
+                sku_dt = datetime.strptime(p["sku_first_date"], "%Y-%m-%d")
+                if not (start_dt <= sku_dt <= end_dt):
+                    continue
+            except Exception:
+                pass
+        if not has_sharp_drop(p["stocks_graph"]):
+            continue
+        filtered.append(p["id"])
+    return filtered
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def main():
+    print(
+        f"{'товаров':>10} {'цикл, с':>10} {'вектор, с':>10} {'ускорение':>10}"
+        f" {'Product, с':>11} {'батч, с':>9} {'итого':>8}"
+    )
+    for n in SIZES:
+        items = make_items(n)
+        _, parse_time = timed(legacy_products, items)
+        expected, legacy_time = timed(legacy_filter, items, **PARAMS, drop_threshold_percent=DROP_THRESHOLD)
+
+        batch, build_time = timed(ProductBatch.from_items, items)
+        product_filter = ProductFilter(**PARAMS, drop_threshold_percent=DROP_THRESHOLD)
+        filtered, vector_time = timed(lambda: batch.take(product_filter.select(batch)))
+
+        assert filtered.ids.tolist() == expected, "результаты фильтров расходятся"
+        total_speedup = (parse_time + legacy_time) / (build_time + vector_time)
+        print(
+            f"{n:>10} {legacy_time:>10.3f} {vector_time:>10.3f} {legacy_time / vector_time:>9.1f}x"
+            f" {parse_time:>11.3f} {build_time:>9.3f} {total_speedup:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
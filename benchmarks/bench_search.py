@@ -0,0 +1,92 @@
+"""
+Бенчмарк поиска категорий: прежний цикл с fuzz.partial_ratio по каждой категории
+против предрассчитанного CategoryIndex. Заодно проверяет, что выдача совпадает.
+
+Цель — меньше миллисекунды на запрос без кэша, чтобы подсказки категорий успевали за вводом.
+Запросы с опечаткой доходят до нечёткого этапа и держатся у её границы (~0.6–1 мс на 8000 категорий),
+остальные — около 0.1 мс. Совпадение выдачи гарантировано не всегда: нечёткий этап оценивает
+только категории с общей с запросом триграммой, если их хватает на limit.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_search
+"""
+import random
+import time
+
+from rapidfuzz import fuzz
+from transliterate import translit
+
+from feature.related_categories.category_index import CategoryIndex, normalize_query
+
+ROOTS = ["Женщинам", "Мужчинам", "Детям", "Дом", "Красота", "Электроника", "Спорт", "Обувь", "Аксессуары", "Зоотовары"]
+WORDS = [
+    "Одежда", "Платья", "Брюки", "Джинсы", "Куртки", "Пальто", "Свитеры", "Футболки", "Рубашки", "Юбки",
+    "Кроссовки", "Ботинки", "Сапоги", "Сумки", "Ремни", "Часы", "Кухня", "Посуда", "Текстиль", "Освещение",
+    "Уход за кожей", "Макияж", "Парфюмерия", "Смартфоны", "Наушники", "Ноутбуки", "Игрушки", "Коляски",
+    "Тренажёры", "Велосипеды", "Корм", "Лежанки", "Белье", "Носки", "Шапки", "Перчатки", "Шарфы", "Пижамы",
+]
+QUERIES = ["платья", "джинсы", "krossovki", "наушники", "плятья", "курта", "дом/кухня", "shapki", "корм для", "ут"]
+CATEGORY_COUNT = 8_000
+ROUNDS = 20
+
+
+def make_categories(n: int) -> list:
+    rnd = random.Random(7)
+    categories = []
+    while len(categories) < n:
+        parts = [rnd.choice(ROOTS)] + rnd.sample(WORDS, rnd.randint(1, 3))
+        categories.append({"name": parts[-1], "path": "/".join(parts)})
+    return categories
+
+
+def legacy_search(categories: list, query: str, limit: int = 10, threshold: int = 60) -> list:
+    """Прежняя реализация CategorySearcher.search."""
+    query = query.lower()
+    if any("a" <= ch.lower() <= "z" for ch in query):
+        try:
+            query = translit(query, "ru")
+        except Exception:
+            pass
+    exact_matches = []
+    fuzzy_matches = []
+    for c in categories:
+        name = c.get("name", "").lower()
+        path = c.get("path", "").lower()
+        if query in name or query in path:
+            exact_matches.append((100, c))
+            continue
+        score = max(fuzz.partial_ratio(query, name), fuzz.partial_ratio(query, path))
+        if score >= threshold:
+            fuzzy_matches.append((score, c))
+    results = exact_matches + sorted(fuzzy_matches, key=lambda x: x[0], reverse=True)
+    return [r[1] for r in results[:limit]]
+
+
+def timed(func, *args) -> float:
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        func(*args)
+    return (time.perf_counter() - started) / ROUNDS * 1000
+
+
+def main():
+    categories = make_categories(CATEGORY_COUNT)
+    started = time.perf_counter()
+    index = CategoryIndex(categories)
+    print(f"Категорий: {len(categories)}, построение индекса {(time.perf_counter() - started) * 1000:.0f} мс\n")
+
+    print(f"{'запрос':>12} {'старый, мс':>11} {'индекс, мс':>11} {'из кэша, мс':>12} {'совпадает':>10}")
+    for query in QUERIES:
+        same = all(
+            legacy_search(categories, query, limit) == index.search(query, limit)
+            for limit in (1, 10, 50, len(categories))
+        )
+        legacy_ms = timed(legacy_search, categories, query)
+        # Без кэша запросов: нормализация и оба этапа поиска каждый раз заново
+        index_ms = timed(lambda q: index._search(normalize_query.__wrapped__(q), 10, 60), query)
+        cached_ms = timed(index.search, query)
+        print(f"{query:>12} {legacy_ms:>11.2f} {index_ms:>11.3f} {cached_ms:>12.4f} {str(same):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,15 @@
 import json
 import os
 import logging
+import tempfile
 import colorlog
 from aiogram import Bot
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from dotenv import load_dotenv
 
-from database.user_repository import UserRepository
+from database.async_user_repository import AsyncUserRepository
+from database.pending_edit_store import create_pending_edit_store
 
 logger = logging.getLogger()
 
@@ -57,10 +59,87 @@ MPSTATS_API_TOKEN = os.getenv('MPSTATS_API_TOKEN')
 
 BASE_URL = "https://mpstats.io/api"
 MAX_PAGE_SIZE = 5000
-MAX_TOTAL_PRODUCTS = 100_000
+MAX_PAGE_CONCURRENCY = 4  # одновременных запросов страниц одной категории
+MAX_TOTAL_PRODUCTS = 500_000
 DATE_FORMAT = "%Y-%m-%d"
 
-database = UserRepository('bot.db')
+# Пул HTTP-соединений к MPStats
+HTTP_POOL_LIMIT = 100
+HTTP_POOL_LIMIT_PER_HOST = 20
+HTTP_DNS_CACHE_TTL = 300  # секунд
+HTTP_KEEPALIVE_TIMEOUT = 60  # секунд
+HTTP_REQUEST_TIMEOUT = 120  # секунд
+
+# Кэш ответов MPStats
+MPSTATS_CACHE_DB = "mpstats_cache.db"
+MPSTATS_CACHE_MAX_BYTES = 1024 * 1024 * 1024  # 1 ГБ сжатых ответов
+MPSTATS_REFRESH_HOUR = 6  # час ежедневного обновления данных MPStats (локальное время)
+
+# Ограничение частоты запросов к MPStats: эндпоинт -> (запросов в секунду, всплеск)
+MPSTATS_RATE_LIMITS = {
+    "default": (2.0, 4),
+    "/wb/get/category": (2.0, 4),
+    "/wb/get/categories": (0.5, 1),
+}
+
+# Повторы запросов при 429/5xx и сетевых ошибках
+MPSTATS_MAX_RETRIES = 4
+MPSTATS_BACKOFF_BASE = 1.0  # секунд
+MPSTATS_BACKOFF_MAX = 30.0  # секунд
+
+# CPU-тяжёлые этапы отчёта выполняются вне event loop бота
+CPU_POOL_KIND = "process"  # "process" — ProcessPoolExecutor, "thread" — ThreadPoolExecutor
+CPU_POOL_WORKERS = 2
+MAX_CONCURRENT_RENDERS = 2  # одновременно формируемых отчётов
+
+# Очередь /products: число воркеров, приоритет по правам (меньше — раньше) и частота правок сообщения о ходе
+REPORT_QUEUE_WORKERS = 2
+REPORT_PRIORITIES = {"root": 0, "admin": 0, "moder": 1, "user": 2}
+REPORT_PROGRESS_INTERVAL = 3.0  # секунд
+
+# Допуск отчётов по памяти: контейнер ограничен 4 ГБ (docker-compose.yml), часть занимают бот и пулы.
+# Оценка отчёта — REPORT_BASE_BYTES + total × REPORT_BYTES_PER_PRODUCT; замеры RSS бота вместе с воркерами
+# CPU-пула могут только повысить байты на товар. Очередь и MAX_CONCURRENT_RENDERS ограничивают число
+# отчётов, а бюджет — их суммарный размер: при значениях по умолчанию самый большой отчёт
+# (MAX_TOTAL_PRODUCTS) оценивается в ~840 МБ, и два отчёта идут одновременно, только если вместе
+# в них меньше ~530 тыс. товаров — иначе второй ждёт, пока первый освободит память
+REPORT_MEMORY_BUDGET = 1024 * 1024 * 1024
+REPORT_BASE_BYTES = 128 * 1024 * 1024
+REPORT_BYTES_PER_PRODUCT = 1_500
+REPORT_ADMISSION_TIMEOUT = 600  # секунд ожидания свободной памяти
+
+# Готовые отчёты пишутся во временные файлы и удаляются после отправки
+REPORTS_TMP_DIR = os.path.join(tempfile.gettempdir(), "shepherd_reports")
+
+# Хранилище готовых отчётов: повтор с теми же параметрами до обновления данных MPStats
+# отправляется по file_id Telegram. Файлы на диске ограничены по объёму
+REPORT_STORE_DB = "reports.db"
+REPORT_STORE_DIR = "reports"
+REPORT_STORE_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 2 ГБ
+
+# Незавершённые правки параметров (/info → ввод значения): "sqlite" — общие для всех воркеров
+# и переживают перезапуск, "memory" — только в памяти процесса
+PENDING_EDIT_STORE = "sqlite"
+PENDING_EDIT_TTL = 10 * 60  # секунд на ввод значения
+PENDING_EDIT_SWEEP_INTERVAL = 5 * 60  # секунд между очистками просроченных правок
+
+# Кэш строк пользователей в UserRepository. Изменения из этого процесса сбрасывают запись сразу,
+# изменения из других процессов бота становятся видны не позже чем через USER_CACHE_TTL
+USER_CACHE_TTL = 60  # секунд
+USER_CACHE_SIZE = 1024  # пользователей
+
+# Кэш авторизации: неизвестные пользователи запоминаются, чтобы их сообщения не доходили до БД.
+# Известные перечитываются раз в AUTH_CACHE_TTL — как и USER_CACHE_TTL, ради других процессов бота
+AUTH_CACHE_TTL = 60  # секунд
+AUTH_NEGATIVE_CACHE_SIZE = 1024
+AUTH_NEGATIVE_CACHE_TTL = 60  # секунд
+
+database = AsyncUserRepository(
+    'bot.db',
+    pending_edits=create_pending_edit_store(PENDING_EDIT_STORE, 'bot.db', PENDING_EDIT_TTL),
+    user_cache_ttl=USER_CACHE_TTL,
+    user_cache_size=USER_CACHE_SIZE
+)
 
 bot = Bot(
     token=TELEGRAM_BOT_TOKEN,
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from database.pending_edit_store import MemoryPendingEditStore, PendingEditStore
+from database.user_repository import UserRepository, USER_CACHE_DEFAULT_SIZE, USER_CACHE_DEFAULT_TTL
+
+# config импортирует этот модуль, поэтому логгер берётся напрямую (тот же корневой логгер)
+logger = logging.getLogger()
+
+PENDING_EDIT_DEFAULT_TTL = 600  # секунд
+
+
+class AsyncUserRepository:
+    """
+    Асинхронная обёртка над UserRepository с тем же набором методов.
+    Все обращения к SQLite выполняются в одном выделенном потоке: commit с fsync
+    не блокирует event loop, а запросы к соединению идут строго по очереди.
+    Пользователь, уже прочитанный в кэш репозитория, возвращается сразу, без перехода в поток БД.
+    Незавершённые правки хранятся в pending_edits (см. PendingEditStore); start() запускает
+    периодическую очистку просроченных правок.
+    Подписчики add_change_listener вызываются с username после каждого изменения пользователя.
+    """
+
+    def __init__(
+            self,
+            db_path: str = 'bot.db',
+            pending_edits: Optional[PendingEditStore] = None,
+            user_cache_ttl: float = USER_CACHE_DEFAULT_TTL,
+            user_cache_size: int = USER_CACHE_DEFAULT_SIZE
+    ):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="userdb")
+        self._repo = UserRepository(db_path, user_cache_ttl, user_cache_size)
+        self.pending_edits = pending_edits or MemoryPendingEditStore(PENDING_EDIT_DEFAULT_TTL)
+        self._sweeper: Optional[asyncio.Task] = None
+        self._change_listeners: List[Callable[[str], None]] = []
+
+    async def _run(self, func: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def user_exists(self, username: str) -> bool:
+        if self._repo.get_cached_user(username) is not None:
+            return True
+        return await self._run(self._repo.user_exists, username)
+
+    async def get_user(self, username: str) -> Optional[Dict]:
+        user = self._repo.get_cached_user(username)
+        if user is not None:
+            return user
+        return await self._run(self._repo.get_user, username)
+
+    async def add_user(self, user_data: Dict):
+        await self._run(self._repo.add_user, user_data)
+        self._notify_changed(user_data['username'])
+
+    async def update_user_param(self, username: str, param: str, value):
+        await self._run(self._repo.update_user_param, username, param, value)
+        self._notify_changed(username)
+
+    def add_change_listener(self, listener: Callable[[str], None]):
+        """Подписка на изменения пользователей (для кэшей поверх репозитория)."""
+        self._change_listeners.append(listener)
+
+    def _notify_changed(self, username: str):
+        for listener in self._change_listeners:
+            listener(username)
+
+    # ✅ Методы для работы с редактированием
+    async def set_pending_edit(self, username: str, param: str, target: str):
+        await self._run(self.pending_edits.set, username, param, target)
+
+    async def get_pending_edit(self, username: str) -> Optional[Dict]:
+        return await self._run(self.pending_edits.get, username)
+
+    async def clear_pending_edit(self, username: str):
+        await self._run(self.pending_edits.clear, username)
+
+    def start(self, sweep_interval: float):
+        """Запускает фоновую очистку просроченных правок раз в sweep_interval секунд."""
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep(sweep_interval))
+
+    async def _sweep(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                removed = await self._run(self.pending_edits.compact)
+                if removed:
+                    logger.info(f"🧹 Удалено просроченных правок: {removed}")
+            except Exception as e:
+                logger.error(f"Ошибка очистки просроченных правок: {e}")
+
+    def close(self):
+        """Останавливает очистку, дожидается поставленных запросов и закрывает соединения."""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        self._executor.shutdown(wait=True)
+        self.pending_edits.close()
+        self._repo.close()
@@ -0,0 +1,121 @@
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+
+
+class PendingEditStore(ABC):
+    """
+    Хранилище незавершённых правок: какой параметр какого пользователя редактирует username
+    (значение придёт следующим текстовым сообщением). Запись живёт ttl секунд;
+    просроченные записи не возвращаются и удаляются при compact().
+    Методы синхронные — AsyncUserRepository вызывает их в своём потоке БД.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+
+    @abstractmethod
+    def set(self, username: str, param: str, target: str):
+        ...
+
+    @abstractmethod
+    def get(self, username: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def clear(self, username: str):
+        ...
+
+    @abstractmethod
+    def compact(self) -> int:
+        """Удаляет просроченные записи, возвращает их число."""
+
+    def close(self):
+        pass
+
+
+class MemoryPendingEditStore(PendingEditStore):
+    """Правки в памяти процесса: теряются при перезапуске и не видны другим воркерам бота."""
+
+    def __init__(self, ttl: float):
+        super().__init__(ttl)
+        self._edits: Dict[str, Tuple[Dict, float]] = {}
+
+    def set(self, username: str, param: str, target: str):
+        self._edits[username] = ({"param": param, "target": target}, time.time() + self.ttl)
+
+    def get(self, username: str) -> Optional[Dict]:
+        entry = self._edits.get(username)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return dict(entry[0])
+
+    def clear(self, username: str):
+        self._edits.pop(username, None)
+
+    def compact(self) -> int:
+        now = time.time()
+        expired = [username for username, (_, expires_at) in self._edits.items() if expires_at <= now]
+        for username in expired:
+            del self._edits[username]
+        return len(expired)
+
+
+class SqlitePendingEditStore(PendingEditStore):
+    """
+    Правки в таблице SQLite: переживают перезапуск и общие для всех воркеров бота,
+    работающих с одним файлом БД.
+    """
+
+    def __init__(self, db_path: str, ttl: float):
+        super().__init__(ttl)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        with self.conn:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS pending_edits (
+                    username TEXT PRIMARY KEY,
+                    param TEXT NOT NULL,
+                    target TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_pending_edits_expires_at ON pending_edits (expires_at)')
+
+    def set(self, username: str, param: str, target: str):
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO pending_edits (username, param, target, expires_at) VALUES (?, ?, ?, ?)',
+                (username, param, target, time.time() + self.ttl)
+            )
+
+    def get(self, username: str) -> Optional[Dict]:
+        row = self.conn.execute(
+            'SELECT param, target FROM pending_edits WHERE username = ? AND expires_at > ?',
+            (username, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        return {"param": row[0], "target": row[1]}
+
+    def clear(self, username: str):
+        with self.conn:
+            self.conn.execute('DELETE FROM pending_edits WHERE username = ?', (username,))
+
+    def compact(self) -> int:
+        with self.conn:
+            return self.conn.execute('DELETE FROM pending_edits WHERE expires_at <= ?', (time.time(),)).rowcount
+
+    def close(self):
+        self.conn.close()
+
+
+def create_pending_edit_store(kind: str, db_path: str, ttl: float) -> PendingEditStore:
+    """kind="sqlite" — таблица в db_path, kind="memory" — словарь в памяти процесса."""
+    if kind == "sqlite":
+        return SqlitePendingEditStore(db_path, ttl)
+    if kind == "memory":
+        return MemoryPendingEditStore(ttl)
+    raise ValueError(f"Неизвестное хранилище правок: {kind}")
@@ -1,12 +1,49 @@
 import sqlite3
-from typing import Optional, Dict
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Tuple
+
+# Поля, которые можно менять через update_user_param (имя колонки подставляется в SQL)
+USER_FIELDS = ("rights", "dates", "turnover_days_max", "revenue_min", "category", "percent", "access_until")
+
+# Запросы — постоянные строки: sqlite3 кэширует подготовленные выражения по тексту запроса
+SELECT_USER = 'SELECT * FROM users WHERE username = ?'
+INSERT_USER = '''
+    INSERT OR REPLACE INTO users
+    (username, rights, dates, turnover_days_max, revenue_min, category, percent, access_until)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+UPDATE_FIELD = {field: f'UPDATE users SET {field} = ? WHERE username = ?' for field in USER_FIELDS}
+
+USER_CACHE_DEFAULT_TTL = 60  # секунд
+USER_CACHE_DEFAULT_SIZE = 1024  # пользователей
 
 
 class UserRepository:
-    def __init__(self, db_path: str = 'bot.db'):
-        self.conn = sqlite3.connect(db_path)
+    """
+    Синхронный доступ к таблице пользователей. Из хэндлеров используется через
+    AsyncUserRepository, который выполняет все запросы в отдельном потоке.
+    """
+
+    def __init__(
+            self,
+            db_path: str = 'bot.db',
+            cache_ttl: float = USER_CACHE_DEFAULT_TTL,
+            cache_size: int = USER_CACHE_DEFAULT_SIZE
+    ):
+        # Соединение создаётся в потоке импорта, а используется в потоке БД AsyncUserRepository
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        # WAL: чтения не ждут записи; synchronous=NORMAL — fsync только при checkpoint, а не на каждый commit
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        # Кэш пользователей на процесс: строка живёт cache_ttl секунд или до изменения через
+        # add_user/update_user_param этого экземпляра. TTL ограничивает отставание от изменений,
+        # сделанных другими процессами бота; при переполнении вытесняются самые старые записи.
+        # Изменяется кэш только в потоке БД, get_cached_user из event loop его лишь читает
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._users: OrderedDict[str, Tuple[Dict, float]] = OrderedDict()
         self._create_table()
-        self._pending_edits = {}
 
     def _create_table(self):
         """Создаём таблицу с новыми полями percent и access_until"""
@@ -39,17 +76,10 @@ class UserRepository:
             self.add_user(default_user)
 
     def user_exists(self, username: str) -> bool:
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT 1 FROM users WHERE username = ?', (username,))
-        return cursor.fetchone() is not None
+        return self._load_user(username) is not None
 
     def add_user(self, user_data: Dict):
-        query = '''
-            INSERT OR REPLACE INTO users 
-            (username, rights, dates, turnover_days_max, revenue_min, category, percent, access_until)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        '''
-        self.conn.execute(query, (
+        self.conn.execute(INSERT_USER, (
             user_data['username'],
             user_data['rights'],
             user_data['dates'],
@@ -60,43 +90,63 @@ class UserRepository:
             user_data.get('access_until', None)
         ))
         self.conn.commit()
+        self._users.pop(user_data['username'], None)
 
     def get_user(self, username: str) -> Optional[Dict]:
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
-        row = cursor.fetchone()
-        if row:
-            return {
-                'username': row[0],
-                'rights': row[1],
-                'dates': row[2],
-                'turnover_days_max': row[3],
-                'revenue_min': row[4],
-                'category': row[5],
-                'percent': row[6],
-                'access_until': row[7]
-            }
-        return None
+        user = self._load_user(username)
+        # Копия, чтобы изменения у вызывающего не попали в кэш
+        return dict(user) if user else None
+
+    def get_cached_user(self, username: str) -> Optional[Dict]:
+        """Копия строки пользователя, если она есть в кэше и не устарела; в БД не обращается."""
+        user = self._cached(username)
+        return dict(user) if user else None
 
-    # ✅ Методы для работы с редактированием
-    def set_pending_edit(self, username: str, param: str, target: str):
-        self._pending_edits[username] = {"param": param, "target": target}
+    def _cached(self, username: str) -> Optional[Dict]:
+        entry = self._users.get(username)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[0]
 
-    def get_pending_edit(self, username: str):
-        return self._pending_edits.get(username)
+    def _load_user(self, username: str) -> Optional[Dict]:
+        """Строка пользователя из кэша, при промахе — из БД. Отсутствующие пользователи не кэшируются."""
+        user = self._cached(username)
+        if user is not None:
+            return user
 
-    def clear_pending_edit(self, username: str):
-        self._pending_edits.pop(username, None)
+        cursor = self.conn.cursor()
+        cursor.execute(SELECT_USER, (username,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        user = {
+            'username': row[0],
+            'rights': row[1],
+            'dates': row[2],
+            'turnover_days_max': row[3],
+            'revenue_min': row[4],
+            'category': row[5],
+            'percent': row[6],
+            'access_until': row[7]
+        }
+        self._users.pop(username, None)
+        self._users[username] = (user, time.monotonic() + self.cache_ttl)
+        while len(self._users) > self.cache_size:
+            self._users.popitem(last=False)
+        return user
 
     def update_user_param(self, username: str, param: str, value):
         """Обновление конкретного параметра пользователя в БД"""
+        if param not in USER_FIELDS:
+            raise ValueError(f"Недопустимый параметр: {param}")
         if not self.user_exists(username):
             raise ValueError("Пользователь не найден")
         self._update_field(username, param, value)
 
     def _update_field(self, username: str, field: str, value):
         with self.conn:
-            self.conn.execute(
-                f'UPDATE users SET {field} = ? WHERE username = ?',
-                (value, username)
-            )
+            self.conn.execute(UPDATE_FIELD[field], (value, username))
+        self._users.pop(username, None)
+
+    def close(self):
+        self.conn.close()
@@ -1,43 +1,96 @@
 from io import BytesIO
-import pandas as pd
+from typing import Iterable, List, Sequence
+
+import xlsxwriter
+
+URL_COLUMNS = ("Ссылка WB", "MPStats")
+
+# Excel допускает не больше 65 530 гиперссылок на лист; дальше ссылки пишутся обычным текстом
+MAX_URLS_PER_SHEET = 65_530
+
+
+class ExcelStreamWriter:
+    """
+    Построчная запись листа в режиме constant_memory: записанные строки сразу уходят на диск.
+    Строки — последовательности значений в порядке columns; способ записи каждой колонки
+    выбирается один раз при открытии листа, а не для каждой ячейки.
+    """
+
+    def __init__(self, output, sheet_name: str, columns: List[str], columns_config: dict):
+        self.output = output
+        self.columns = columns
+        self.rows_written = 0
+        # strings_to_urls отключён: ссылки пишутся только в колонках URL_COLUMNS, без проверки каждой строки
+        self.workbook = xlsxwriter.Workbook(output, {"constant_memory": True, "strings_to_urls": False})
+        self.worksheet = self.workbook.add_worksheet(sheet_name)
+        self.url_format = self.workbook.get_default_url_format()
+
+        # Заголовки
+        for col_idx, col_name in enumerate(columns):
+            col_letter = chr(65 + col_idx)
+            if col_letter in columns_config:
+                self.worksheet.set_column(f"{col_letter}:{col_letter}", columns_config[col_letter])
+        self.worksheet.write_row(0, 0, columns)
+
+        self.url_columns = [j for j, col in enumerate(columns) if col in URL_COLUMNS]
+        self.plain_columns = [j for j, col in enumerate(columns) if col not in URL_COLUMNS]
+        self._urls_left = MAX_URLS_PER_SHEET
+
+    def write_rows(self, rows: Iterable[Sequence]):
+        """Дописывает строки в конец листа (в constant_memory строки пишутся только по порядку)."""
+        worksheet = self.worksheet
+        write = worksheet.write
+        write_url = worksheet.write_url
+        write_string = worksheet.write_string
+        url_format = self.url_format
+        url_columns = self.url_columns
+        plain_columns = self.plain_columns
+
+        row_idx = self.rows_written
+        for row in rows:
+            row_idx += 1
+            for j in plain_columns:
+                write(row_idx, j, row[j])
+            for j in url_columns:
+                value = row[j]
+                if self._urls_left > 0 and isinstance(value, str) and value.startswith("http"):
+                    write_url(row_idx, j, value, url_format, value)
+                    self._urls_left -= 1
+                elif isinstance(value, str):
+                    write_string(row_idx, j, value)
+                else:
+                    write(row_idx, j, value)
+        self.rows_written = row_idx
+
+    def close(self):
+        self.workbook.close()
+        if hasattr(self.output, "seek"):
+            self.output.seek(0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
 
 class ExcelBuilder:
-    """Утилита для построения Excel-файлов из DataFrame с минимальным потреблением памяти."""
+    """Утилита для построения Excel-файлов из строк с минимальным потреблением памяти."""
     def __init__(self, sheet_name: str = "Отчёт"):
         self.sheet_name = sheet_name
 
-    def build(self, df: pd.DataFrame, columns_config: dict) -> BytesIO:
+    def stream(self, columns: List[str], columns_config: dict, output=None) -> ExcelStreamWriter:
+        """
+        Открывает потоковую запись листа; строки добавляются по мере готовности.
+        output — путь к файлу или файловый объект, по умолчанию BytesIO.
+        """
+        return ExcelStreamWriter(output if output is not None else BytesIO(), self.sheet_name, columns, columns_config)
+
+    def build(self, rows: Iterable[Sequence], columns: List[str], columns_config: dict) -> BytesIO:
         """
-        Создаёт Excel-файл из DataFrame с заданной шириной колонок.
-        Поддерживает гиперссылки и форматирование, возвращает BytesIO.
+        Создаёт Excel-файл из строк (значения в порядке columns) с заданной шириной колонок.
+        Поддерживает гиперссылки, возвращает BytesIO.
         """
-        output = BytesIO()
-        chunk_size = 5000
-
-        with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-            workbook = writer.book
-            worksheet = workbook.add_worksheet(self.sheet_name)
-            writer.sheets[self.sheet_name] = worksheet
-
-            # Заголовки
-            for col_idx, col_name in enumerate(df.columns):
-                worksheet.write(0, col_idx, col_name)
-                col_letter = chr(65 + col_idx)
-                if col_letter in columns_config:
-                    worksheet.set_column(f"{col_letter}:{col_letter}", columns_config[col_letter])
-
-            # Запись данных чанками
-            row_offset = 1
-            for start in range(0, len(df), chunk_size):
-                df_chunk = df.iloc[start:start+chunk_size]
-                for i, (_, row) in enumerate(df_chunk.iterrows()):
-                    for j, col in enumerate(df.columns):
-                        value = row[col]
-                        if col in ("Ссылка WB", "MPStats") and isinstance(value, str) and value.startswith("http"):
-                            worksheet.write_url(row_offset + i, j, value, string=value)
-                        else:
-                            worksheet.write(row_offset + i, j, value)
-                row_offset += len(df_chunk)
-
-        output.seek(0)
-        return output
+        with self.stream(columns, columns_config) as sheet:
+            sheet.write_rows(rows)
+        return sheet.output
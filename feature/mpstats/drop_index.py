@@ -0,0 +1,70 @@
+import json
+from typing import List
+
+import numpy as np
+
+from api.mpstats_module import ProductBatch, NO_DATE
+
+
+class DropIndex:
+    """
+    Товары датасета, прошедшие условия отчёта без порога падения, вместе с их максимальным
+    падением остатков. Отсортированный массив падений превращает любой порог
+    в бинарный поиск и срез, без повторного просмотра графиков.
+    """
+
+    def __init__(self, batch: ProductBatch, max_drop: np.ndarray):
+        self.batch = batch  # в исходном порядке (по выручке), без графиков остатков
+        self.max_drop = max_drop
+        self.order = np.argsort(max_drop, kind="stable")
+        self.sorted_drop = max_drop[self.order]
+
+    def __len__(self) -> int:
+        return len(self.batch)
+
+    def select(self, drop_threshold_percent: float) -> ProductBatch:
+        """Товары с максимальным падением >= порога, в исходном порядке."""
+        start = np.searchsorted(self.sorted_drop, drop_threshold_percent, side="left")
+        return self.batch.take(np.sort(self.order[start:]))
+
+    def to_bytes(self) -> bytes:
+        return json.dumps({
+            "ids": self.batch.ids.tolist(),
+            "names": self.batch.names.tolist(),
+            "revenue": self.batch.revenue.tolist(),
+            "turnover_days": self.batch.turnover_days.tolist(),
+            "max_drop": self.max_drop.tolist(),
+        }, ensure_ascii=False).encode("utf-8")
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> "DropIndex":
+        data = json.loads(raw)
+        size = len(data["ids"])
+        batch = ProductBatch(
+            ids=np.array(data["ids"], dtype=object),
+            names=np.array(data["names"], dtype=object),
+            revenue=np.array(data["revenue"], dtype=np.float64),
+            turnover_days=np.array(data["turnover_days"], dtype=np.float64),
+            sku_first_date=np.full(size, NO_DATE, dtype="datetime64[D]"),
+            stocks_values=np.empty(0, dtype=np.float64),
+            stocks_offsets=np.zeros(size + 1, dtype=np.int64),
+        )
+        return cls(batch, np.array(data["max_drop"], dtype=np.float64))
+
+
+class DropIndexBuilder:
+    """Собирает DropIndex по страницам по мере потоковой обработки отчёта."""
+
+    def __init__(self):
+        self._batches: List[ProductBatch] = []
+        self._drops: List[np.ndarray] = []
+
+    def add(self, batch: ProductBatch, candidates: np.ndarray, max_drop: np.ndarray):
+        # Товары без единой учитываемой пары (-inf) не пройдут ни один порог — их не храним
+        has_drop = max_drop > -np.inf
+        self._batches.append(batch.take(candidates[has_drop]).without_stocks())
+        self._drops.append(max_drop[has_drop])
+
+    def build(self) -> DropIndex:
+        max_drop = np.concatenate(self._drops) if self._drops else np.empty(0, dtype=np.float64)
+        return DropIndex(ProductBatch.concat(self._batches), max_drop)
@@ -1,15 +1,16 @@
-import json
+import asyncio
 import os
-from datetime import datetime
-from typing import Tuple, List
+import math
+from typing import AsyncIterator, Awaitable, Callable, Iterator, Optional
 
-import pandas as pd
-
-from api.mpstats_api import MpstatsAPI
-from api.mpstats_module import MpstatsData, Product
-from config import logger
+from api.mpstats_api import MpstatsAPI, CategoryDownload
+from api.mpstats_module import ProductBatch
+from api.response_cache import ResponseCache, response_cache
+from config import logger, MAX_CONCURRENT_RENDERS, MAX_PAGE_SIZE
 from feature.excel.excel import BaseExcelReport
-from feature.excel.excel_builder import ExcelBuilder
+from feature.excel.excel_builder import ExcelBuilder, ExcelStreamWriter
+from feature.mpstats.drop_index import DropIndex, DropIndexBuilder
+from feature.mpstats.product_filter import ProductFilter
 from utils.formatters import (
     format_currency,
     get_turnover_value,
@@ -17,10 +18,17 @@ from utils.formatters import (
     build_mpstats_link
 )
 
+# Одновременно формируемые отчёты: остальные ждут своей очереди, не занимая пул и память
+render_slots = asyncio.Semaphore(MAX_CONCURRENT_RENDERS)
+
+
 class MpstatsExcelReport(BaseExcelReport):
     """Генератор Excel-отчётов по данным MPStats."""
-    def __init__(self):
+    REPORT_COLUMNS = ["№", "Название", "Выручка", "Оборачиваемость", "Ссылка WB", "MPStats"]
+
+    def __init__(self, cache=response_cache):
         self.api = MpstatsAPI(os.getenv("MPSTATS_API_TOKEN"))
+        self.cache = cache
         self.excel = ExcelBuilder("Товары")
         logger.info("🔧 Генератор MPStats-отчетов инициализирован")
 
@@ -31,115 +39,165 @@ class MpstatsExcelReport(BaseExcelReport):
             category: str,
             turnover_days_max: int,
             revenue_min: int,
-            drop_threshold_percent: float
+            drop_threshold_percent: float,
+            download: CategoryDownload = None,
+            output=None,
+            progress: Optional[Callable[..., Awaitable[None]]] = None
     ):
-        """Основной метод генерации отчёта."""
+        """
+        Основной метод генерации отчёта.
+        Страницы API обрабатываются по одной: парсинг, фильтрация и запись строк в Excel,
+        поэтому пиковая память зависит от размера страницы, а не от размера категории.
+        Разбор страниц идёт в CPU-пуле, фильтрация и запись — в потоке, так что event loop
+        бота остаётся свободным; одновременно формируется не больше MAX_CONCURRENT_RENDERS отчётов.
+        Если передана уже открытая загрузка (download), первая страница повторно не запрашивается.
+        output — путь к файлу, в который пишется отчёт; без него отчёт собирается в BytesIO.
+        progress — необязательный обработчик хода: await progress(stage, pages_loaded, pages_total),
+        stage — "loading" после каждой обработанной страницы или "writing" перед сохранением файла.
+
+        Попутно строится индекс максимальных падений остатков (DropIndex) и сохраняется в кэш
+        до обновления данных MPStats: повторный отчёт по тем же данным с другим порогом
+        падения собирается из индекса без загрузки и просмотра графиков.
+        """
         try:
             self.validate_dates(start_date, end_date)
-            products, _ = await self._fetch_api_data(start_date, end_date, category, revenue_min, turnover_days_max)
-            df = self._prepare_dataframe(products, start_date, end_date, turnover_days_max, revenue_min, drop_threshold_percent)
-            excel = self.excel.build(df, self._get_columns_config())
-            return excel
+            product_filter = ProductFilter(turnover_days_max, revenue_min, start_date, end_date, drop_threshold_percent)
+            index_key = ResponseCache.make_key(
+                "report_drop_index",
+                {"d1": start_date, "d2": end_date, "path": category},
+                {"turnover_days_max": turnover_days_max, "revenue_min": revenue_min}
+            )
+
+            total_products = 0
+            async with render_slots:
+                sheet = self.excel.stream(self.REPORT_COLUMNS, self._get_columns_config(), output)
+                try:
+                    drop_index = await self._load_drop_index(index_key)
+                    if drop_index is not None:
+                        logger.info(f"⚡ Индекс падений для '{category}' взят из кэша ({len(drop_index)} товаров)")
+                        total_products = len(drop_index)
+                        await self._notify(progress, "writing")
+                        await asyncio.to_thread(
+                            self._write_from_index, sheet, drop_index, drop_threshold_percent, start_date, end_date
+                        )
+                    else:
+                        logger.info(f"📡 Запрос данных для категории '{category}' с {start_date} по {end_date}")
+                        if download is None:
+                            download = await self.api.open_category(start_date, end_date, category, revenue_min, turnover_days_max)
+
+                        index_builder = DropIndexBuilder()
+                        pages_total = max(1, math.ceil(download.total / MAX_PAGE_SIZE))
+                        pages_loaded = 0
+                        async for batch in self._iter_products(download):
+                            total_products += len(batch)
+                            await asyncio.to_thread(
+                                self._write_page, sheet, batch, product_filter, index_builder, start_date, end_date
+                            )
+                            pages_loaded += 1
+                            await self._notify(progress, "loading", pages_loaded, pages_total)
+
+                        await self._notify(progress, "writing", pages_loaded, pages_total)
+
+                        await self._save_drop_index(index_key, index_builder)
+                finally:
+                    # Закрытие книги — сжатие листа в zip, тоже вне event loop
+                    await asyncio.to_thread(sheet.close)
+
+            logger.info(f"📦 Обработано {sheet.rows_written} товаров из {total_products}")
+            return sheet.output
 
         except Exception as e:
             logger.error(f"Ошибка при создании отчёта: {e}", exc_info=True)
             raise
 
-    async def _fetch_api_data(self, start_date: str, end_date: str, category: str, revenue_min: int, turnover_days_max: int) -> Tuple[List[Product], dict]:
-        """Получает данные из MPStats API."""
-        logger.info(f"📡 Запрос данных для категории '{category}' с {start_date} по {end_date}")
-        raw_data = await self.api.get_category_data(start_date, end_date, category, revenue_min, turnover_days_max)
-        logger.debug("Полный ответ API:\n%s", json.dumps(raw_data, indent=2, ensure_ascii=False))
-
-        items = raw_data.get("data", []) if isinstance(raw_data, dict) else raw_data
-        return MpstatsData(items).products, raw_data
-
-    def _prepare_dataframe(
-        self,
-        products: List[Product],
-        start_date: str,
-        end_date: str,
-        turnover_days_max: int,
-        revenue_min: int,
-        drop_threshold_percent: float
-    ) -> pd.DataFrame:
-        """Создаёт DataFrame для отчёта."""
-        filtered = self._filter_products(products, turnover_days_max, revenue_min, start_date, end_date, drop_threshold_percent)
-        logger.info(f"📦 Обработка {len(filtered)} товаров из {len(products)}")
-
-        rows = []
-        for idx, product in enumerate(filtered, start=1):
-            try:
-                rows.append(self._product_to_row(idx, product, start_date, end_date))
-            except Exception as e:
-                logger.error(f"Ошибка обработки товара #{idx}: {e}")
+    @staticmethod
+    async def _notify(progress, stage: str, pages_loaded: int = 0, pages_total: int = 0):
+        """Сообщает о ходе отчёта; ошибка обработчика не должна прерывать сам отчёт."""
+        if progress is None:
+            return
+        try:
+            await progress(stage, pages_loaded, pages_total)
+        except Exception as e:
+            logger.warning(f"Ошибка обработчика хода отчёта: {e}")
 
-        return pd.DataFrame(rows)
+    async def _load_drop_index(self, key: str) -> DropIndex | None:
+        """Индекс падений из кэша, если данные MPStats с тех пор не обновлялись."""
+        if not self.cache:
+            return None
+        return await asyncio.to_thread(self._read_drop_index, key)
 
-    @staticmethod
-    def _filter_products(
-            products: List[Product],
-            turnover_days_max: int,
-            revenue_min: int,
-            start_date: str,
-            end_date: str,
-            drop_threshold_percent: float
-    ) -> List[Product]:
-        """Фильтрует товары по обороту, выручке, дате первого SKU и резкому падению остатков."""
-        start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-        end_dt = datetime.strptime(end_date, "%Y-%m-%d")
-
-        def has_sharp_drop(stocks_graph: List[int]) -> bool:
-            """Проверяет резкое падение остатков по графику."""
-            if not stocks_graph or len(stocks_graph) < 2:
-                return False
-            for i in range(len(stocks_graph) - 1):
-                current = stocks_graph[i]
-                next_val = stocks_graph[i + 1]
-                if current == 0:
-                    continue
-                drop_percent = (current - next_val) / current * 100
-                if drop_percent >= drop_threshold_percent:
-                    return True
-            return False
-
-        filtered = []
-        for p in products:
-            turnover = p.turnover_days or 0
-            revenue = p.revenue or 0
-
-            # Фильтр
-            if turnover >= turnover_days_max or revenue <= revenue_min:
-                continue
-
-            # Проверка sku_first_date
-            if p.sku_first_date:
-                try:
-                    sku_dt = datetime.strptime(p.sku_first_date, "%Y-%m-%d")
-                    if not (start_dt <= sku_dt <= end_dt):
-                        continue
-                except Exception:
-                    pass
+    def _read_drop_index(self, key: str) -> DropIndex | None:
+        raw = self.cache.get(key)
+        return DropIndex.from_bytes(raw) if raw is not None else None
 
-            # Проверка резкого падения
-            stocks_graph = p.raw_data.get("stocks_graph", [])
-            if not has_sharp_drop(stocks_graph):
-                continue
+    async def _save_drop_index(self, key: str, index_builder: DropIndexBuilder):
+        if self.cache:
+            await asyncio.to_thread(lambda: self.cache.put(key, index_builder.build().to_bytes()))
 
-            filtered.append(p)
-        return filtered
+    def _write_page(
+            self,
+            sheet: ExcelStreamWriter,
+            batch: ProductBatch,
+            product_filter: ProductFilter,
+            index_builder: DropIndexBuilder,
+            start_date: str,
+            end_date: str
+    ):
+        """
+        Фильтрует страницу, пополняет индекс падений и дописывает строки в лист.
+        Выполняется в потоке: страницы обрабатываются строго по очереди, поэтому лист
+        и индекс в каждый момент использует только один поток.
+        """
+        candidates, max_drop = product_filter.candidates(batch)
+        index_builder.add(batch, candidates, max_drop)
+        filtered = batch.take(candidates[max_drop >= product_filter.drop_threshold_percent])
+        sheet.write_rows(self._products_to_rows(filtered, sheet.rows_written + 1, start_date, end_date))
+
+    def _write_from_index(
+            self,
+            sheet: ExcelStreamWriter,
+            drop_index: DropIndex,
+            drop_threshold_percent: float,
+            start_date: str,
+            end_date: str
+    ):
+        filtered = drop_index.select(drop_threshold_percent)
+        sheet.write_rows(self._products_to_rows(filtered, 1, start_date, end_date))
 
     @staticmethod
-    def _product_to_row(idx: int, product: Product, start_date: str, end_date: str) -> dict:
-        """Преобразует товар в строку отчёта."""
-        return {
-            "№": idx,
-            "Название": product.name,
-            "Выручка": format_currency(product.revenue),
-            "Оборачиваемость": get_turnover_value(product.raw_data),
-            "Ссылка WB": get_wb_link(product.id),
-            "MPStats": build_mpstats_link(product.id, start_date, end_date),
-        }
+    async def _iter_products(download: CategoryDownload) -> AsyncIterator[ProductBatch]:
+        """Постранично получает товары из MPStats API."""
+        async for batch in download.pages():
+            yield batch
+
+    def _products_to_rows(self, batch: ProductBatch, start_idx: int, start_date: str, end_date: str) -> Iterator[tuple]:
+        """Преобразует отфильтрованные товары страницы в строки отчёта."""
+        columns = zip(batch.ids.tolist(), batch.names.tolist(), batch.revenue.tolist(), batch.turnover_days.tolist())
+        for idx, (product_id, name, revenue, turnover_days) in enumerate(columns, start=start_idx):
+            try:
+                yield self._product_to_row(idx, product_id, name, revenue, turnover_days, start_date, end_date)
+            except Exception as e:
+                logger.error(f"Ошибка обработки товара #{idx}: {e}")
+
+    @staticmethod
+    def _product_to_row(
+            idx: int,
+            product_id,
+            name: str,
+            revenue: float,
+            turnover_days: float,
+            start_date: str,
+            end_date: str
+    ) -> tuple:
+        """Преобразует товар в строку отчёта (значения в порядке REPORT_COLUMNS)."""
+        return (
+            idx,                                                   # №
+            name,                                                  # Название
+            format_currency(revenue),                              # Выручка
+            get_turnover_value(turnover_days),                     # Оборачиваемость
+            get_wb_link(product_id),                               # Ссылка WB
+            build_mpstats_link(product_id, start_date, end_date),  # MPStats
+        )
 
     @staticmethod
     def _get_columns_config() -> dict:
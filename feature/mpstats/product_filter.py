@@ -0,0 +1,75 @@
+import numpy as np
+
+from api.mpstats_module import ProductBatch
+
+
+def max_drop_percent(batch: ProductBatch) -> np.ndarray:
+    """
+    Максимальное падение остатков между соседними точками графика для каждого товара, в процентах.
+    Пары с нулевым текущим значением (и с пропусками) не считаются; у товара без таких пар — -inf.
+    """
+    values = batch.stocks_values
+    offsets = batch.stocks_offsets
+    result = np.full(len(batch), -np.inf)
+    if len(values) < 2:
+        return result
+
+    current = values[:-1]
+    # (current - next) / current * 100 — тот же порядок операций, что и в прежнем построчном цикле
+    drops = current - values[1:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drops /= current
+    drops *= 100
+
+    # Пара j — точки j и j + 1; на стыке двух товаров такая пара не считается
+    drops[(current == 0) | np.isnan(drops)] = -np.inf
+    boundaries = offsets[1:-1] - 1
+    drops[boundaries[(boundaries >= 0) & (boundaries < len(drops))]] = -np.inf
+
+    # Пары товара k занимают [offsets[k], offsets[k + 1] - 1); отрезки reduceat захватывают
+    # только пары-стыки и товары без пар, а они уже равны -inf
+    starts = offsets[:-1]
+    has_pairs = offsets[1:] - 1 > starts
+    if has_pairs.any():
+        result[has_pairs] = np.maximum.reduceat(drops, starts[has_pairs])
+    return result
+
+
+class ProductFilter:
+    """Векторный фильтр товаров отчёта: все условия считаются масками по колонкам ProductBatch."""
+
+    def __init__(
+            self,
+            turnover_days_max: int,
+            revenue_min: int,
+            start_date: str,
+            end_date: str,
+            drop_threshold_percent: float
+    ):
+        self.turnover_days_max = turnover_days_max
+        self.revenue_min = revenue_min
+        self.start_dt = np.datetime64(start_date, "D")
+        self.end_dt = np.datetime64(end_date, "D")
+        self.drop_threshold_percent = drop_threshold_percent
+
+    def base_mask(self, batch: ProductBatch) -> np.ndarray:
+        """Условия, не зависящие от порога падения: оборот, выручка и дата первого SKU."""
+        mask = (batch.turnover_days < self.turnover_days_max) & (batch.revenue > self.revenue_min)
+
+        # Товары без даты первого SKU (NaT) не отсекаются
+        sku_dates = batch.sku_first_date
+        mask &= np.isnat(sku_dates) | ((sku_dates >= self.start_dt) & (sku_dates <= self.end_dt))
+        return mask
+
+    def candidates(self, batch: ProductBatch) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Индексы товаров, прошедших условия без порога, и их максимальное падение остатков.
+        Падение считается только для товаров, прошедших дешёвые условия.
+        """
+        candidates = np.flatnonzero(self.base_mask(batch))
+        return candidates, max_drop_percent(batch.take(candidates))
+
+    def select(self, batch: ProductBatch) -> np.ndarray:
+        """Индексы товаров, прошедших все условия, в исходном порядке."""
+        candidates, drops = self.candidates(batch)
+        return candidates[drops >= self.drop_threshold_percent]
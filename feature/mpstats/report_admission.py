@@ -0,0 +1,169 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional
+
+import psutil
+
+from config import (
+    logger,
+    REPORT_MEMORY_BUDGET,
+    REPORT_BASE_BYTES,
+    REPORT_BYTES_PER_PRODUCT,
+    REPORT_ADMISSION_TIMEOUT,
+)
+from text import REPORT_TOO_LARGE, REPORT_ADMISSION_TIMED_OUT
+
+# Замер памяти отчёта: период опроса RSS, минимальный размер категории для замера и вес нового замера
+RSS_SAMPLE_INTERVAL = 0.2  # секунд
+MIN_MEASURED_PRODUCTS = 20_000
+MEASURE_WEIGHT = 0.3
+
+
+class AdmissionRejected(Exception):
+    """Отчёт не допущен к формированию; текст исключения — сообщение для пользователя."""
+
+
+class ReportAdmission:
+    """
+    Допуск отчётов к формированию: сумма оценок памяти активных отчётов не превышает budget
+    (один отчёт на пользователя гарантирует очередь ReportQueue). Оценка — base_bytes + total × bytes_per_product,
+    где bytes_per_product уточняется по замерам RSS отчётов, шедших в одиночку, но не опускается
+    ниже заданного значения.
+    Отчёт, не помещающийся в свободный остаток бюджета, ждёт своей очереди до timeout секунд;
+    отчёт, который не поместится даже в пустой бюджет, отклоняется сразу.
+    """
+
+    def __init__(
+            self,
+            budget: int = REPORT_MEMORY_BUDGET,
+            base_bytes: int = REPORT_BASE_BYTES,
+            bytes_per_product: float = REPORT_BYTES_PER_PRODUCT,
+            timeout: float = REPORT_ADMISSION_TIMEOUT
+    ):
+        self.budget = budget
+        self.base_bytes = base_bytes
+        self.bytes_per_product = bytes_per_product
+        # Замеры только повышают оценку: после прошлых отчётов аллокатор держит освобождённые арены,
+        # и рост RSS следующего отчёта почти нулевой — без нижней границы оценка сползла бы к нулю
+        self.min_bytes_per_product = bytes_per_product
+        self.timeout = timeout
+        self.reserved = 0
+        self._active = 0  # допущенных отчётов
+        self._waiting: Deque[object] = deque()
+        self._changed = asyncio.Condition()
+        self.stats = {"admitted": 0, "waited": 0, "rejected": 0}
+
+    def estimate(self, total: int) -> int:
+        """Оценка пиковой памяти отчёта по числу товаров категории, в байтах."""
+        return int(self.base_bytes + total * self.bytes_per_product)
+
+    @asynccontextmanager
+    async def admit(self, username: str, total: int, on_wait: Optional[Callable[[], Awaitable[None]]] = None):
+        """
+        Резервирует память под отчёт на время блока async with.
+        Выбрасывает AdmissionRejected, если отчёт не может быть допущен.
+        """
+        estimate = self.estimate(total)
+        if estimate > self.budget:
+            self.stats["rejected"] += 1
+            logger.warning(f"Отчёт для {username} отклонён: оценка {estimate / 2 ** 20:.0f} МБ больше бюджета")
+            raise AdmissionRejected(REPORT_TOO_LARGE.format(category_count=total))
+
+        ticket = object()
+        # Ожидающие допускаются строго по очереди, чтобы мелкие отчёты не обгоняли крупный бесконечно
+        self._waiting.append(ticket)
+
+        def fits() -> bool:
+            return self._waiting[0] is ticket and self.reserved + estimate <= self.budget
+
+        try:
+            if not fits():
+                self.stats["waited"] += 1
+                logger.info(
+                    f"Отчёт для {username} ждёт памяти: нужно {estimate / 2 ** 20:.0f} МБ, "
+                    f"занято {self.reserved / 2 ** 20:.0f} из {self.budget / 2 ** 20:.0f} МБ"
+                )
+                # Сообщение пользователю уходит в Telegram до захвата условия,
+                # чтобы сетевой запрос не задерживал допуск и освобождение других отчётов
+                if on_wait:
+                    await on_wait()
+            async with self._changed:
+                try:
+                    await asyncio.wait_for(self._changed.wait_for(fits), self.timeout)
+                except asyncio.TimeoutError:
+                    self.stats["rejected"] += 1
+                    raise AdmissionRejected(REPORT_ADMISSION_TIMED_OUT)
+                self.reserved += estimate
+        finally:
+            self._waiting.remove(ticket)
+            async with self._changed:
+                self._changed.notify_all()
+        self.stats["admitted"] += 1
+
+        self._active += 1
+        alone = self._active == 1
+        sampler = RssSampler()
+        sampler.start()
+        try:
+            yield
+        finally:
+            peak_growth = await sampler.stop()
+            if alone and self._active == 1 and total >= MIN_MEASURED_PRODUCTS:
+                self._learn(total, peak_growth)
+            self._active -= 1
+            async with self._changed:
+                self.reserved -= estimate
+                self._changed.notify_all()
+
+    def _learn(self, total: int, peak_growth: int):
+        """
+        Уточняет bytes_per_product по замеру отчёта, шедшего без соседей.
+        Рост RSS (вместе с воркерами CPU-пула) делится на total целиком, base_bytes остаётся запасом.
+        """
+        measured = max(0, peak_growth) / total
+        self.bytes_per_product = max(
+            self.min_bytes_per_product,
+            self.bytes_per_product + MEASURE_WEIGHT * (measured - self.bytes_per_product)
+        )
+        logger.info(f"📏 Память отчёта: {measured:.0f} Б/товар, оценка теперь {self.bytes_per_product:.0f} Б/товар")
+
+
+class RssSampler:
+    """
+    Фоновый опрос RSS процесса вместе с дочерними (воркеры CPU-пула разбирают страницы отчёта):
+    насколько память выросла от старта до пика.
+    """
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self._process = psutil.Process()
+        self._start = 0
+        self._peak = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def rss(self) -> int:
+        total = self._process.memory_info().rss
+        for child in self._process.children(recursive=True):
+            # Воркер мог завершиться между получением списка и замером (например, пул пересоздан)
+            with suppress(psutil.Error):
+                total += child.memory_info().rss
+        return total
+
+    def start(self):
+        self._start = self._peak = self.rss()
+        self._task = asyncio.create_task(self._sample())
+
+    async def _sample(self):
+        while True:
+            self._peak = max(self._peak, self.rss())
+            await asyncio.sleep(self.interval)
+
+    async def stop(self) -> int:
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._peak = max(self._peak, self.rss())
+        return self._peak - self._start
+
+
+report_admission = ReportAdmission()
@@ -0,0 +1,134 @@
+import asyncio
+import itertools
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from config import logger, REPORT_QUEUE_WORKERS, REPORT_PRIORITIES
+
+
+class ReportJob:
+    """
+    Заявка на отчёт: кто запросил, с каким приоритетом и что выполнить.
+    on_position вызывается при постановке в очередь и когда позиция ожидающей заявки меняется;
+    все его вызовы завершаются до запуска run.
+    """
+
+    def __init__(
+            self,
+            username: str,
+            rights: str,
+            run: Callable[["ReportJob"], Awaitable[None]],
+            on_position: Optional[Callable[[int], Awaitable[None]]] = None
+    ):
+        self.username = username
+        self.rights = rights
+        self.priority = REPORT_PRIORITIES.get(rights, max(REPORT_PRIORITIES.values()))
+        self.run = run
+        self.on_position = on_position
+        self.key = (self.priority, 0)  # место в очереди, назначается в ReportQueue.submit
+        self.started = False
+        self.position = 0  # последняя сообщённая позиция
+        self.announcement: Optional[asyncio.Task] = None  # последнее сообщение о позиции
+
+
+class ReportQueue:
+    """
+    Очередь отчётов с фиксированным числом воркеров.
+    Заявки обслуживаются по приоритету прав (меньше — раньше), при равном приоритете — по порядку подачи.
+    У пользователя одновременно может быть только одна заявка: повторные /products не ставятся в очередь.
+    """
+
+    def __init__(self, workers: int = REPORT_QUEUE_WORKERS):
+        self.workers = workers
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._seq = itertools.count()
+        self._jobs: Dict[str, ReportJob] = {}
+        self._workers: List[asyncio.Task] = []
+        self.stats = {"submitted": 0, "deduplicated": 0, "completed": 0, "failed": 0}
+
+    def start(self):
+        """Запускает воркеров, если они ещё не запущены."""
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+            logger.info(f"📋 Очередь отчётов запущена (воркеров: {self.workers})")
+
+    async def close(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, job: ReportJob) -> Optional[int]:
+        """
+        Ставит заявку в очередь и возвращает её позицию (1 — следующая на выполнение).
+        Если у пользователя уже есть заявка в очереди или в работе, возвращает None.
+        """
+        if job.username in self._jobs:
+            self.stats["deduplicated"] += 1
+            return None
+
+        self.start()
+        self._jobs[job.username] = job
+        job.key = (job.priority, next(self._seq))
+        self._queue.put_nowait((job.key, job))
+        self.stats["submitted"] += 1
+        # Новой заявке сообщается её позиция, заявки с меньшим приоритетом сдвигаются назад
+        self._announce_positions()
+        return self.position(job)
+
+    def position(self, job: ReportJob) -> int:
+        """Сколько заявок будет выполнено раньше этой, плюс один; 0 — заявка уже в работе."""
+        if job.started:
+            return 0
+        return 1 + sum(1 for other in self._jobs.values() if not other.started and other.key < job.key)
+
+    def active(self, username: str) -> Optional[ReportJob]:
+        return self._jobs.get(username)
+
+    def _announce_positions(self):
+        """
+        Сообщает ожидающим заявкам их новую позицию. Сообщения отправляются в фоне, чтобы не задерживать
+        submit и воркеров, и по цепочке: каждое ждёт предыдущее той же заявки, поэтому правки не обгоняют друг друга.
+        """
+        for job in self._jobs.values():
+            if job.started or job.on_position is None:
+                continue
+            position = self.position(job)
+            if position != job.position:
+                job.position = position
+                job.announcement = asyncio.create_task(self._announce(job, position, job.announcement))
+
+    @staticmethod
+    async def _announce(job: ReportJob, position: int, previous: Optional[asyncio.Task]):
+        if previous is not None:
+            await previous
+        if job.started:
+            return
+        try:
+            await job.on_position(position)
+        except Exception as e:
+            logger.warning(f"Не удалось сообщить позицию в очереди для {job.username}: {e}")
+
+    async def _worker(self, worker_id: int):
+        while True:
+            _, job = await self._queue.get()
+            job.started = True
+            self._announce_positions()
+            try:
+                # Запоздавшая правка «позиция N» не должна перезаписать ход отчёта: ждём начатую,
+                # а ещё не начатые пропустят правку, увидев job.started
+                if job.announcement is not None:
+                    await job.announcement
+                logger.info(f"📋 Воркер {worker_id}: отчёт для {job.username} (права {job.rights})")
+                await job.run(job)
+                self.stats["completed"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.error(f"Ошибка задачи отчёта для {job.username}: {e}", exc_info=True)
+            finally:
+                self._jobs.pop(job.username, None)
+                self._queue.task_done()
+
+
+report_queue = ReportQueue()
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import suppress
+from typing import Optional
+
+from api.response_cache import evict_lru, next_mpstats_refresh
+from config import logger, REPORT_STORE_DB, REPORT_STORE_DIR, REPORT_STORE_MAX_BYTES, MPSTATS_REFRESH_HOUR
+
+# Параметры, от которых зависит содержимое отчёта (см. ProductReportService.get_report_params)
+REPORT_KEY_FIELDS = (
+    "category", "start_date", "end_date", "revenue_min", "turnover_days_max", "drop_threshold_percent"
+)
+
+
+class ReportStore:
+    """
+    Готовые отчёты по ключу из их параметров: файл на диске и file_id документа в Telegram.
+    Повторный запрос с теми же параметрами отправляется по file_id — без загрузки данных,
+    формирования файла и повторной выгрузки в Telegram.
+    Записи живут до ежедневного обновления данных MPStats. Файлы занимают не больше max_bytes:
+    сверх лимита давно не запрошенные файлы удаляются, а их file_id остаются до истечения записи.
+    Методы синхронные — из хэндлеров вызываются через asyncio.to_thread.
+    """
+
+    def __init__(
+            self,
+            db_path: str = REPORT_STORE_DB,
+            directory: str = REPORT_STORE_DIR,
+            max_bytes: int = REPORT_STORE_MAX_BYTES,
+            refresh_hour: int = MPSTATS_REFRESH_HOUR
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.refresh_hour = refresh_hour
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._create_table()
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "evictions": 0}
+
+    def _create_table(self):
+        with self.conn:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS reports (
+                    key TEXT PRIMARY KEY,
+                    path TEXT,
+                    size INTEGER NOT NULL,
+                    file_id TEXT,
+                    caption TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            ''')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_reports_last_access ON reports (last_access)')
+
+    @staticmethod
+    def make_key(params: dict) -> str:
+        """Ключ по параметрам отчёта; пользователь в ключ не входит — отчёт общий для одинаковых настроек."""
+        raw = json.dumps({name: params[name] for name in REPORT_KEY_FIELDS}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Сохранённый отчёт: {"path", "file_id", "caption", "filename"} или None.
+        path — None, если файл уже вытеснен с диска (тогда остаётся только file_id).
+        """
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT path, file_id, caption, filename, expires_at FROM reports WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None:
+                path, file_id, caption, filename, expires_at = row
+                if path is not None and not os.path.exists(path):
+                    path = None
+                if expires_at <= now or (path is None and file_id is None):
+                    self._delete(key)
+                    row = None
+
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+
+            with self.conn:
+                self.conn.execute('UPDATE reports SET last_access = ? WHERE key = ?', (now, key))
+            self.stats["hits"] += 1
+
+        return {"path": path, "file_id": file_id, "caption": caption, "filename": filename}
+
+    def put(self, key: str, report_path: str, caption: str, filename: str) -> Optional[str]:
+        """
+        Переносит готовый файл отчёта в хранилище и возвращает его новый путь.
+        Если такой же отчёт уже сохранён (его сформировала параллельная задача), новый файл
+        удаляется и возвращается путь сохранённого: его файл и file_id остаются на месте,
+        пока другая задача может выгружать их в Telegram.
+        Если файл больше лимита хранилища, он не сохраняется — возвращается None,
+        и вызывающий сам удаляет временный файл после отправки.
+        """
+        size = os.path.getsize(report_path)
+        if size > self.max_bytes:
+            return None
+
+        os.makedirs(self.directory, exist_ok=True)
+        # У каждого файла своё имя: замена записи не трогает файл, который ещё выгружается
+        stored_path = os.path.join(self.directory, f"{key}-{uuid.uuid4().hex}.xlsx")
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT path, file_id, expires_at FROM reports WHERE key = ?', (key,)
+            ).fetchone()
+            old_path, file_id, expires_at = row if row is not None else (None, None, 0)
+            if expires_at <= now:
+                file_id = None
+            elif old_path is not None and os.path.exists(old_path):
+                os.remove(report_path)
+                with self.conn:
+                    self.conn.execute('UPDATE reports SET last_access = ? WHERE key = ?', (now, key))
+                return old_path
+
+            shutil.move(report_path, stored_path)
+            with self.conn:
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO reports (key, path, size, file_id, caption, filename, expires_at, last_access) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (key, stored_path, size, file_id, caption, filename, next_mpstats_refresh(now, self.refresh_hour), now)
+                )
+            # Прежний файл записи (если он был) удаляется только после замены записи
+            if old_path is not None:
+                with suppress(FileNotFoundError):
+                    os.remove(old_path)
+            self.stats["stored"] += 1
+            self._evict(now)
+        return stored_path
+
+    def set_file_id(self, key: str, file_id: Optional[str]):
+        """Запоминает file_id отправленного документа; None — file_id больше не принимается Telegram."""
+        with self._lock:
+            with self.conn:
+                self.conn.execute('UPDATE reports SET file_id = ? WHERE key = ?', (file_id, key))
+
+    def cleanup(self):
+        """Удаляет истёкшие записи и файлы, на которые не ссылается ни одна запись (например, после сбоя)."""
+        with self._lock:
+            self._evict(time.time())
+            if not os.path.isdir(self.directory):
+                return
+            known = {row[0] for row in self.conn.execute('SELECT path FROM reports WHERE path IS NOT NULL')}
+            removed = 0
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if path not in known:
+                    with suppress(OSError):
+                        os.remove(path)
+                        removed += 1
+        if removed:
+            logger.info(f"🧹 Удалено файлов отчётов без записи в хранилище: {removed}")
+
+    def _delete(self, key: str):
+        row = self.conn.execute('SELECT path FROM reports WHERE key = ?', (key,)).fetchone()
+        if row and row[0]:
+            with suppress(FileNotFoundError):
+                os.remove(row[0])
+        with self.conn:
+            self.conn.execute('DELETE FROM reports WHERE key = ?', (key,))
+
+    def _evict(self, now: float):
+        """Удаляет истёкшие записи и вытесняет файлы LRU, пока они не влезут в max_bytes."""
+        for (key,) in self.conn.execute('SELECT key FROM reports WHERE expires_at <= ?', (now,)).fetchall():
+            self._delete(key)
+
+        total, evicted = evict_lru(self.conn, "reports", self.max_bytes, self._drop_file, where="path IS NOT NULL")
+        if evicted:
+            self.stats["evictions"] += evicted
+            logger.info(f"🗄 Хранилище отчётов ужато до {total} байт ({self.stats['evictions']} вытеснений всего)")
+
+    def _drop_file(self, key: str):
+        """Удаляет файл отчёта; запись с file_id остаётся — отчёт по-прежнему отправляется по нему."""
+        path, file_id = self.conn.execute('SELECT path, file_id FROM reports WHERE key = ?', (key,)).fetchone()
+        if file_id is None:
+            self._delete(key)
+            return
+        with suppress(FileNotFoundError):
+            os.remove(path)
+        with self.conn:
+            self.conn.execute('UPDATE reports SET path = NULL WHERE key = ?', (key,))
+
+
+report_store = ReportStore()
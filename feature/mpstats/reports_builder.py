@@ -1,7 +1,12 @@
+import os
+import tempfile
+from contextlib import suppress
 from datetime import datetime, timedelta
+
+from api.mpstats_api import CategoryDownload
 from feature.mpstats.mpstats_reports import MpstatsExcelReport
 
-from config import logger, DATE_FORMAT
+from config import logger, DATE_FORMAT, REPORTS_TMP_DIR
 
 
 class ProductReportService:
@@ -11,30 +16,70 @@ class ProductReportService:
         self.database = database
         self.report_generator = MpstatsExcelReport()
 
-    async def generate_user_report(self, username: str) -> tuple[bytes, str, str] | None:
-        """Формирует отчёт для конкретного пользователя."""
+    @staticmethod
+    def get_report_params(user_data: dict) -> dict:
+        """Параметры отчёта пользователя: период и фильтры."""
+        days = user_data["dates"]
+
+        # Расчёт диапазона дат
+        now = datetime.now()
+        end_date = (now - timedelta(days=1)).strftime(DATE_FORMAT)
+        start_date = (now - timedelta(days=days)).strftime(DATE_FORMAT)
+
+        return {
+            "start_date": start_date,
+            "end_date": end_date,
+            "category": user_data["category"],
+            "turnover_days_max": user_data["turnover_days_max"],
+            "revenue_min": user_data["revenue_min"],
+            "drop_threshold_percent": user_data["percent"],
+        }
+
+    async def open_category(self, params: dict) -> CategoryDownload:
+        """Загружает первую страницу категории вместе с total — по нему проверяется лимит отчёта."""
+        return await self.report_generator.api.open_category(
+            params["start_date"],
+            params["end_date"],
+            params["category"],
+            params["revenue_min"],
+            params["turnover_days_max"]
+        )
+
+    async def generate_user_report(
+            self,
+            username: str,
+            download: CategoryDownload = None,
+            progress=None,
+            params: dict = None
+    ) -> tuple[str, str, str] | None:
+        """
+        Формирует отчёт для конкретного пользователя.
+        download — загрузка, уже открытая через open_category: отчёт продолжит её со второй страницы.
+        progress — обработчик хода отчёта (см. MpstatsExcelReport.generate_report).
+        params — уже подготовленные get_report_params параметры; без них читаются из БД.
+
+        Возвращает путь к временному файлу отчёта, подпись и имя файла для отправки.
+        Файл пишется сразу на диск и в память целиком не читается; после отправки
+        вызывающий обязан удалить его через discard_report.
+        """
+        report_path = None
         try:
-            user_data = self.database.get_user(username)
-            if not user_data:
-                logger.warning(f"Пользователь {username} не найден в БД")
-                return None
-
-            # Получаем данные пользователя
-            days = user_data["dates"]
-            category = user_data["category"]
-            turnover_days_max = user_data["turnover_days_max"]
-            revenue_min = user_data["revenue_min"]
-            drop_threshold_percent = user_data["percent"]
-
-            # Расчёт диапазона дат
-            now = datetime.now()
-            end_date = (now - timedelta(days=1)).strftime(DATE_FORMAT)
-            start_date = (now - timedelta(days=days)).strftime(DATE_FORMAT)
+            if params is None:
+                user_data = await self.database.get_user(username)
+                if not user_data:
+                    logger.warning(f"Пользователь {username} не найден в БД")
+                    return None
+                params = self.get_report_params(user_data)
+
+            start_date, end_date, category = params["start_date"], params["end_date"], params["category"]
 
             logger.info(f"Формирование отчёта для {username}: {start_date} — {end_date}, {category}")
 
-            # Генерация Excel
-            excel_file = await self.report_generator.generate_report(start_date, end_date, category, turnover_days_max, revenue_min, drop_threshold_percent)
+            # Генерация Excel во временный файл
+            report_path = self._new_report_path()
+            await self.report_generator.generate_report(
+                **params, download=download, output=report_path, progress=progress
+            )
 
             # Подготовка описания
             caption = (
@@ -45,8 +90,37 @@ class ProductReportService:
 
             filename = f"WB_report_{datetime.now().strftime('%d.%m.%Y')}.xlsx"
 
-            return excel_file.getvalue(), caption, filename
+            return report_path, caption, filename
 
         except Exception as e:
             logger.error(f"Ошибка формирования отчёта для {username}: {e}", exc_info=True)
+            if report_path:
+                self.discard_report(report_path)
             return None
+
+    @staticmethod
+    def _new_report_path() -> str:
+        os.makedirs(REPORTS_TMP_DIR, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix="wb_report_", suffix=".xlsx", dir=REPORTS_TMP_DIR)
+        os.close(fd)
+        return path
+
+    @staticmethod
+    def discard_report(path: str):
+        """Удаляет временный файл отчёта."""
+        with suppress(FileNotFoundError):
+            os.remove(path)
+
+    @staticmethod
+    def cleanup_stale_reports():
+        """Удаляет файлы отчётов, оставшиеся от прошлого запуска (например, после аварийной остановки)."""
+        if not os.path.isdir(REPORTS_TMP_DIR):
+            return
+        removed = 0
+        for name in os.listdir(REPORTS_TMP_DIR):
+            if name.startswith("wb_report_"):
+                with suppress(OSError):
+                    os.remove(os.path.join(REPORTS_TMP_DIR, name))
+                    removed += 1
+        if removed:
+            logger.info(f"🧹 Удалено временных файлов отчётов: {removed}")
@@ -1,46 +1,145 @@
+import asyncio
 import os
-import json
+import pickle
+import struct
+import tempfile
 import time
+import zlib
 
 from api.mpstats_api import MpstatsAPI
 from config import logger
+from feature.related_categories.category_index import CategoryIndex
+from feature.related_categories.category_prefix_index import CategoryPrefixIndex
 
-CACHE_FILE = "categories.json"
+CACHE_FILE = "categories.bin"
 CACHE_TTL = 60 * 60 * 24  # 24 часа
 
+# Заголовок файла кэша: сигнатура, версия схемы, CRC32 и длина сжатых данных.
+# При изменении состава индексов версия увеличивается — старый файл просто перестраивается
+CACHE_MAGIC = b"SHCATIDX"
+CACHE_VERSION = 1
+CACHE_HEADER = struct.Struct(">8sHIQ")
+
+
+class CategorySnapshot:
+    """Список категорий вместе с уже построенными поисковым и префиксным индексами."""
+
+    def __init__(self, categories: list, index: CategoryIndex, prefix_index: CategoryPrefixIndex):
+        self.categories = categories
+        self.index = index
+        self.prefix_index = prefix_index
+
+    @classmethod
+    def build(cls, categories: list) -> "CategorySnapshot":
+        return cls(categories, CategoryIndex(categories), CategoryPrefixIndex(categories))
+
+    @classmethod
+    def empty(cls) -> "CategorySnapshot":
+        return cls.build([])
+
+    def to_bytes(self) -> bytes:
+        # Файл пишет и читает только сам бот; целостность проверяется по CRC32 до распаковки
+        payload = zlib.compress(pickle.dumps(
+            (self.categories, self.index, self.prefix_index),
+            protocol=pickle.HIGHEST_PROTOCOL
+        ), 1)
+        return CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, zlib.crc32(payload), len(payload)) + payload
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> "CategorySnapshot":
+        """Разбирает файл кэша; при несовпадении сигнатуры, версии или контрольной суммы — ValueError."""
+        if len(raw) < CACHE_HEADER.size:
+            raise ValueError("файл короче заголовка")
+        magic, version, checksum, size = CACHE_HEADER.unpack_from(raw)
+        payload = raw[CACHE_HEADER.size:]
+        if magic != CACHE_MAGIC:
+            raise ValueError("неизвестный формат")
+        if version != CACHE_VERSION:
+            raise ValueError(f"версия {version}, ожидается {CACHE_VERSION}")
+        if len(payload) != size or zlib.crc32(payload) != checksum:
+            raise ValueError("контрольная сумма не совпадает")
+        return cls(*pickle.loads(zlib.decompress(payload)))
+
 
 class CategoryCache:
-    def __init__(self):
+    """
+    Кэш категорий MPStats на диске вместе с готовыми индексами поиска:
+    холодный старт не разбирает JSON и не строит индексы заново.
+    Файл заменяется атомарно (временный файл + os.replace), поэтому читатель
+    видит либо старую, либо новую версию целиком.
+    """
+
+    def __init__(self, cache_file: str = CACHE_FILE):
         self.api = MpstatsAPI()
+        self.cache_file = cache_file
 
     async def get_categories(self, force_refresh: bool = False):
         """Возвращает список категорий (из кэша или API)."""
+        return (await self.get_snapshot(force_refresh)).categories
+
+    async def get_snapshot(self, force_refresh: bool = False) -> CategorySnapshot:
+        """Категории с индексами: из файла кэша, если он свежий, иначе из API."""
         if not force_refresh and self._is_cache_valid():
-            try:
-                with open(CACHE_FILE, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    logger.info(f"Категории загружены из кэша ({len(data)}).")
-                    return data
-            except Exception as e:
-                logger.warning(f"Ошибка чтения кэша: {e}")
+            snapshot = await asyncio.to_thread(self._read_cache)
+            if snapshot is not None:
+                return snapshot
 
         logger.info("Обновление категорий с API MPStats...")
         data = await self.api.get_categories()
-        self._save_cache(data)
-        return data
+        if data:
+            # Построение индексов и запись файла — вне event loop
+            return await asyncio.to_thread(self._build_and_save, data)
+
+        # MPStats недоступен — лучше устаревший кэш, чем пустой список (и он не перезаписывается)
+        if os.path.exists(self.cache_file):
+            logger.warning("Не удалось обновить категории, используется устаревший кэш.")
+            return await asyncio.to_thread(self._read_cache) or CategorySnapshot.empty()
+        return CategorySnapshot.empty()
+
+    def _build_and_save(self, data: list) -> CategorySnapshot:
+        snapshot = CategorySnapshot.build(data)
+        self._save_cache(snapshot)
+        return snapshot
+
+    def _read_cache(self) -> CategorySnapshot | None:
+        try:
+            with open(self.cache_file, "rb") as f:
+                snapshot = CategorySnapshot.from_bytes(f.read())
+            logger.info(f"Категории загружены из кэша ({len(snapshot.categories)}).")
+            return snapshot
+        except Exception as e:
+            logger.warning(f"Ошибка чтения кэша: {e}")
+            return None
+
+    def saved_at(self) -> float | None:
+        """Время последнего сохранения кэша (mtime файла) или None, если файла нет."""
+        try:
+            return os.path.getmtime(self.cache_file)
+        except OSError:
+            return None
 
     def _is_cache_valid(self) -> bool:
         """Проверяет, не устарел ли кэш."""
-        if not os.path.exists(CACHE_FILE):
+        if not os.path.exists(self.cache_file):
             return False
-        mtime = os.path.getmtime(CACHE_FILE)
+        mtime = os.path.getmtime(self.cache_file)
         return (time.time() - mtime) < CACHE_TTL
 
-    def _save_cache(self, data: list):
-        """Сохраняет данные в кэш."""
+    def _save_cache(self, snapshot: CategorySnapshot):
+        """Сохраняет категории с индексами: пишет во временный файл рядом и атомарно подменяет кэш."""
+        directory = os.path.dirname(os.path.abspath(self.cache_file))
+        tmp_path = None
         try:
-            with open(CACHE_FILE, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            logger.info(f"Категории сохранены в кэш ({CACHE_FILE}).")
+            with tempfile.NamedTemporaryFile("wb", dir=directory, prefix=".categories-", delete=False) as f:
+                tmp_path = f.name
+                f.write(snapshot.to_bytes())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.cache_file)
+            tmp_path = None
+            logger.info(f"Категории сохранены в кэш ({self.cache_file}).")
         except Exception as e:
             logger.error(f"Ошибка при сохранении категорий: {e}")
+        finally:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
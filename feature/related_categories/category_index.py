@@ -0,0 +1,175 @@
+from functools import lru_cache
+from typing import Dict, List, Set
+
+import numpy as np
+from rapidfuzz import fuzz, process
+from transliterate import translit
+
+from config import logger
+
+NGRAM = 3
+SEARCH_CACHE_SIZE = 1024  # запросов на индекс
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+def short_grams(text: str) -> Set[str]:
+    """Подстроки короче триграммы: по ним короткий запрос находится без проверки вхождения."""
+    return {text[i:i + n] for n in range(1, NGRAM) for i in range(len(text) - n + 1)}
+
+
+def normalize_path(path: str) -> str:
+    """Ключ сравнения пути категории: без пробелов вокруг "/" и без учёта регистра."""
+    return "/".join(part.strip() for part in path.split("/")).lower()
+
+
+@lru_cache(maxsize=4096)
+def normalize_query(query: str) -> str:
+    """Приводит запрос к нижнему регистру и переводит латиницу в кириллицу, если она есть."""
+    query = query.lower()
+    if any("a" <= ch <= "z" for ch in query):
+        try:
+            transliterated = translit(query, "ru")
+            logger.debug(f"Транслитерация: {query} -> {transliterated}")
+            return transliterated
+        except Exception:
+            pass
+    return query
+
+
+class QueryCacheMixin:
+    """
+    LRU-кэш запросов к неизменяемому индексу: метод cached_method оборачивается в lru_cache
+    размера query_cache_size. Индекс не меняется, поэтому кэш не устаревает; при pickle он
+    не сохраняется — индекс пишется на диск вместе с категориями (CategoryCache).
+    """
+
+    cached_method: str
+    query_cache_size: int
+
+    def _reset_query_cache(self):
+        self._query_cache = lru_cache(maxsize=self.query_cache_size)(getattr(self, self.cached_method))
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_query_cache"]
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._reset_query_cache()
+
+
+class CategoryIndex(QueryCacheMixin):
+    """
+    Поисковый индекс категорий, построенный один раз при загрузке.
+    Названия и пути заранее приведены к нижнему регистру; по триграммам и более коротким подстрокам
+    построен инвертированный индекс. Точное вхождение проверяется только у категорий, содержащих
+    все триграммы запроса, а для запроса короче триграммы список из индекса и есть ответ.
+    Нечёткий этап считается пакетно через rapidfuzz.process.cdist по кандидатам — категориям
+    хотя бы с одной общей с запросом триграммой. Если кандидатов с оценкой не ниже порога меньше,
+    чем нужно для выдачи, оцениваются все категории. Отбор приблизительный: категория без общих
+    триграмм с запросом может иметь оценку выше кандидатов и тогда в выдачу не попадёт.
+    Латиница в категориях не встречается, поэтому транслитерируется только запрос.
+    """
+
+    cached_method = "_search"
+    query_cache_size = SEARCH_CACHE_SIZE
+
+    def __init__(self, categories: List[dict]):
+        self.categories = categories
+        self.names = [c.get("name", "").lower() for c in categories]
+        self.paths = [c.get("path", "").lower() for c in categories]
+        # Названия часто повторяются в разных ветках — нечёткая оценка считается по уникальным
+        unique_names, name_ids = np.unique(np.array(self.names, dtype=object), return_inverse=True)
+        self._unique_names = unique_names.tolist()
+        self._name_ids = name_ids.astype(np.int32)
+        self._reset_query_cache()
+
+        postings: Dict[str, List[int]] = {}
+        for i, (name, path) in enumerate(zip(self.names, self.paths)):
+            for gram in trigrams(name) | trigrams(path) | short_grams(name) | short_grams(path):
+                postings.setdefault(gram, []).append(i)
+        # Списки категорий по подстрокам хранятся одним массивом со смещениями (CSR)
+        self._grams = {gram: k for k, gram in enumerate(postings)}
+        lengths = [len(ids) for ids in postings.values()]
+        self._offsets = np.zeros(len(lengths) + 1, dtype=np.int32)
+        np.cumsum(lengths, out=self._offsets[1:])
+        self._posting_ids = np.fromiter(
+            (i for ids in postings.values() for i in ids), dtype=np.int32, count=int(self._offsets[-1])
+        )
+
+    def __len__(self) -> int:
+        return len(self.categories)
+
+    def search(self, query: str, limit: int = 10, threshold: int = 60) -> List[dict]:
+        """
+        Сначала категории, где запрос входит в название или путь (в порядке списка),
+        затем нечёткие совпадения partial_ratio >= threshold по убыванию оценки.
+        """
+        return [self.categories[i] for i in self._query_cache(normalize_query(query), limit, threshold)]
+
+    def _search(self, query: str, limit: int, threshold: int) -> tuple:
+        """Индексы найденных категорий в порядке выдачи."""
+        exact = self._exact(query)
+        if len(exact) >= limit:
+            return tuple(exact[:limit])
+
+        need = limit - len(exact)
+        ids = self._fuzzy_candidates(query)
+        fuzzy = self._fuzzy(query, ids, exact, threshold)
+        if len(fuzzy) < need and len(ids) < len(self.categories):
+            fuzzy = self._fuzzy(query, np.arange(len(self.categories)), exact, threshold)
+        return tuple(exact) + tuple(fuzzy[:need].tolist())
+
+    def _fuzzy_candidates(self, query: str) -> np.ndarray:
+        """
+        Категории хотя бы с одной общей с запросом триграммой, по возрастанию; для запросов короче
+        триграммы — все категории. Отбор приблизительный: partial_ratio выравнивает более короткую
+        строку и учитывает отрезки на краях, поэтому границы по длине строк у него нет.
+        """
+        if len(query) < NGRAM:
+            return np.arange(len(self.categories))
+        slots = [k for k in map(self._grams.get, trigrams(query)) if k is not None]
+        if not slots:
+            return np.empty(0, dtype=np.int32)
+        return np.unique(np.concatenate([self._posting_ids[self._offsets[k]:self._offsets[k + 1]] for k in slots]))
+
+    def _fuzzy(self, query: str, ids: np.ndarray, exact: List[int], threshold: int) -> np.ndarray:
+        """Категории из ids с оценкой не ниже threshold, кроме точных совпадений, по убыванию оценки."""
+        name_ids, name_index = np.unique(self._name_ids[ids], return_inverse=True)
+        scores = np.maximum(
+            self._scores(query, [self._unique_names[k] for k in name_ids], threshold)[name_index],
+            self._scores(query, [self.paths[i] for i in ids], threshold),
+        )
+        scores[np.isin(ids, exact)] = -1  # точные совпадения уже в выдаче
+        hits = np.flatnonzero(scores >= threshold)
+        return ids[hits[np.argsort(-scores[hits], kind="stable")]]
+
+    def _exact(self, query: str) -> List[int]:
+        """Индексы категорий с точным вхождением запроса в название или путь, по возрастанию."""
+        if not query:
+            return list(range(len(self.categories)))
+        if len(query) < NGRAM:
+            # Короткие подстроки сами есть в индексе, и их список — уже готовый ответ
+            k = self._grams.get(query)
+            return [] if k is None else self._posting_ids[self._offsets[k]:self._offsets[k + 1]].tolist()
+        else:
+            slots = [self._grams.get(gram) for gram in trigrams(query)]
+            if any(k is None for k in slots):
+                return []
+            postings = [self._posting_ids[self._offsets[k]:self._offsets[k + 1]] for k in slots]
+            postings.sort(key=len)
+            candidates = postings[0]
+            for p in postings[1:]:
+                candidates = np.intersect1d(candidates, p, assume_unique=True)
+            candidates = candidates.tolist()
+        return [i for i in candidates if query in self.names[i] or query in self.paths[i]]
+
+    @staticmethod
+    def _scores(query: str, choices: List[str], threshold: int) -> np.ndarray:
+        return process.cdist(
+            [query], choices, scorer=fuzz.partial_ratio, score_cutoff=threshold, dtype=np.float64
+        )[0]
@@ -0,0 +1,53 @@
+from bisect import bisect_left
+from typing import List
+
+import numpy as np
+
+from feature.related_categories.category_index import QueryCacheMixin, normalize_path
+
+PREFIX_CACHE_SIZE = 4096  # префиксов на индекс
+
+
+class CategoryPrefixIndex(QueryCacheMixin):
+    """
+    Префиксный индекс по путям категорий ("Женщинам/Одежда/Платья").
+    Нормализованные пути отсортированы, поэтому все продолжения префикса — непрерывный отрезок,
+    который находится двумя бинарными поисками (то же, что обход поддерева trie, но без узлов в памяти).
+    Продолжения ранжируются: сначала менее глубокие пути, затем по алфавиту.
+    """
+
+    cached_method = "_complete"
+    query_cache_size = PREFIX_CACHE_SIZE
+
+    def __init__(self, categories: List[dict]):
+        paths = [(normalize_path(c["path"]), c) for c in categories if c.get("path")]
+        paths.sort(key=lambda item: item[0])
+        self.keys = [key for key, _ in paths]
+        self.categories = [c for _, c in paths]
+
+        # Место каждого пути в общем порядке выдачи (глубина, путь)
+        depth = np.array([key.count("/") for key in self.keys], dtype=np.int64)
+        order = np.lexsort((np.arange(len(self.keys)), depth))
+        self._rank = np.empty(len(self.keys), dtype=np.int32)
+        self._rank[order] = np.arange(len(self.keys))
+        self._reset_query_cache()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def complete(self, prefix: str, limit: int = 10) -> List[dict]:
+        """Категории, путь которых начинается с prefix (регистр и пробелы вокруг "/" не важны)."""
+        return [self.categories[i] for i in self._query_cache(normalize_path(prefix), limit)]
+
+    def _complete(self, prefix: str, limit: int) -> tuple:
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + "\U0010ffff", lo=start)
+        if start == end:
+            return ()
+        ranks = self._rank[start:end]
+        if end - start > limit:
+            top = np.argpartition(ranks, limit - 1)[:limit]
+        else:
+            top = np.arange(end - start)
+        top = top[np.argsort(ranks[top])]
+        return tuple((top + start).tolist())
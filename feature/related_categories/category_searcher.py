@@ -1,55 +1,94 @@
-from rapidfuzz import fuzz
-from transliterate import translit
+import asyncio
+import time
+from typing import Dict, List, Optional
+
 from config import logger
-from feature.related_categories.category_cache import CategoryCache
+from feature.related_categories.category_cache import CategoryCache, CategorySnapshot, CACHE_TTL
+from feature.related_categories.category_index import normalize_path
+
+REFRESH_RETRY_INTERVAL = 10 * 60  # секунд до повторной попытки после неудачного обновления
 
 
 class CategorySearcher:
-    def __init__(self):
+    """
+    Индекс категорий в памяти процесса. Загружается один раз при старте; по истечении CACHE_TTL
+    запросы продолжают работать со старыми данными, а обновление идёт в фоне (stale-while-revalidate).
+    """
+
+    def __init__(self, ttl: float = CACHE_TTL):
         self.cache = CategoryCache()
-        self.categories = []
+        self.ttl = ttl
+        self._set_snapshot(CategorySnapshot.empty())
+        self.loaded_at = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
 
     async def load(self, force_refresh: bool = False):
-        """Загружает категории из кэша или API."""
-        self.categories = await self.cache.get_categories(force_refresh)
-
-    def _transliterate_query(self, query: str) -> str:
-        """Преобразует латинский запрос в кириллицу, если нужно."""
-        # Если содержит латинские буквы, пробуем перевести
-        if any("a" <= ch.lower() <= "z" for ch in query):
-            try:
-                transliterated = translit(query, "ru")
-                logger.debug(f"Транслитерация: {query} -> {transliterated}")
-                return transliterated
-            except Exception:
-                pass
-        return query
+        """Загружает категории с готовыми индексами из кэша или API."""
+        snapshot = await self.cache.get_snapshot(force_refresh)
+        if not snapshot.categories:
+            logger.warning("Категории не загружены — повтор через несколько минут.")
+            self._retry_later()
+            return
+
+        saved_at = self.cache.saved_at() or time.time()
+        if self.categories and saved_at <= self.loaded_at:
+            # MPStats не ответил и вернулся тот же устаревший файл — пробуем позже
+            self._retry_later()
+        else:
+            self.loaded_at = saved_at
+        self._set_snapshot(snapshot)
+        logger.info(f"🗂 Индекс категорий готов ({len(snapshot.categories)}).")
+
+    def _retry_later(self):
+        self.loaded_at = time.time() - self.ttl + REFRESH_RETRY_INTERVAL
+
+    def _set_snapshot(self, snapshot: CategorySnapshot):
+        # Ключи префиксного индекса — уже нормализованные пути; при повторах побеждает последний
+        self._by_path: Dict[str, dict] = dict(zip(snapshot.prefix_index.keys, snapshot.prefix_index.categories))
+        self.index = snapshot.index
+        self.prefix_index = snapshot.prefix_index
+        self.categories = snapshot.categories
+
+    @property
+    def is_loaded(self) -> bool:
+        return bool(self.categories)
+
+    def is_stale(self) -> bool:
+        return time.time() - self.loaded_at >= self.ttl
+
+    def refresh_if_stale(self):
+        """Запускает фоновое обновление устаревшего индекса; вызывающий не ждёт его завершения."""
+        if self.is_stale() and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.create_task(self._refresh())
+
+    async def _refresh(self):
+        try:
+            await self.load()
+        except Exception as e:
+            logger.error(f"Ошибка фонового обновления категорий: {e}")
+
+    def resolve(self, category: str) -> Optional[dict]:
+        """Категория по пути, введённому пользователем (регистр и пробелы вокруг "/" не важны)."""
+        self.refresh_if_stale()
+        return self._by_path.get(normalize_path(category))
+
+    def complete(self, text: str, limit: int = 10) -> List[dict]:
+        """
+        Подсказки для ввода категории: продолжения пути по префиксу,
+        а если таких нет — результаты нечёткого поиска по введённому тексту.
+        """
+        self.refresh_if_stale()
+        results = self.prefix_index.complete(text, limit)
+        if not results and text.strip():
+            results = self.index.search(text, limit)
+        return results
 
     def search(self, query: str, limit: int = 10, threshold: int = 60):
         """Ищет категории по названию или пути, с учетом опечаток и латиницы."""
         if not self.categories:
             logger.warning("Категории не загружены — вызови load() перед поиском.")
             return []
+        return self.index.search(query, limit, threshold)
 
-        query = query.lower()
-        query = self._transliterate_query(query)
-        exact_matches = []
-        fuzzy_matches = []
-
-        for c in self.categories:
-            name = c.get("name", "").lower()
-            path = c.get("path", "").lower()
-
-            # 1. Точное вхождение
-            if query in name or query in path:
-                exact_matches.append((100, c))
-                continue
-
-            # 2. Нечеткое сравнение (fuzzy)
-            score = max(fuzz.partial_ratio(query, name), fuzz.partial_ratio(query, path))
-            if score >= threshold:
-                fuzzy_matches.append((score, c))
 
-        # Сначала точные, потом fuzzy
-        results = exact_matches + sorted(fuzzy_matches, key=lambda x: x[0], reverse=True)
-        return [r[1] for r in results[:limit]]
+category_searcher = CategorySearcher()
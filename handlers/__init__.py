@@ -1,4 +1,5 @@
 from .info import setup_info
+from .inline_categories import setup_inline_categories
 from .new_user import setup_new_user
 from .products import setup as setup_products
 from .text_edit import setup_handle_text_edit
@@ -8,4 +9,5 @@ def setup(dispatcher):
     setup_products(dispatcher)
     setup_info(dispatcher)
     setup_new_user(dispatcher)
+    setup_inline_categories(dispatcher)
     setup_handle_text_edit(dispatcher)
\ No newline at end of file
@@ -6,30 +6,32 @@ from aiogram.filters import Command
 
 from config import logger, database
 from middleware.permissions import rights_required, check_edit_permission
+from middleware.user_context import UserContext
 from text import *
 from utils.formatters import escape_md
 
 
 @rights_required(["root", "admin", "moder"], self_only_rights=["moder"])
-async def info_command(message: types.Message):
+async def info_command(message: types.Message, user_context: UserContext):
     try:
         args = message.text.split(maxsplit=1)
         current_user = message.from_user.username or str(message.from_user.id)
         target_username = args[1].lstrip("@") if len(args) > 1 and args[1].strip() else current_user
 
-        if not database.user_exists(target_username):
+        # Свою карточку берём из контекста запроса, чужую — одним чтением (из кэша репозитория)
+        if target_username == current_user:
+            user_data = user_context.as_dict()
+        else:
+            user_data = await database.get_user(target_username)
+        if not user_data:
             await message.answer(NOT_FOUND_IN_THE_DATABASE.format(target_username=escape_md(target_username)))
             return
 
-        if not check_edit_permission(current_user, target_username) and current_user != target_username:
+        can_edit = await check_edit_permission(current_user, target_username, current=user_context)
+        if not can_edit and current_user != target_username:
             await message.answer(NO_VIEWING_RIGHTS)
             return
 
-        user_data = database.get_user(target_username)
-        if not user_data:
-            await message.answer(COULDNT_GET_THE_DATA_FOR.format(target_username=escape_md(target_username)))
-            return
-
         is_self = (target_username == current_user)
         display_name = target_username
         rights = user_data.get("rights", "user")
@@ -72,9 +74,7 @@ async def info_command(message: types.Message):
         )
 
         kb = InlineKeyboardBuilder()
-        caller = database.get_user(current_user) or {}
-        caller_rights = caller.get("rights", "user")
-        can_edit = check_edit_permission(current_user, target_username)
+        caller_rights = user_context.rights
 
         if can_edit:
             if caller_rights == "root":
@@ -109,7 +109,7 @@ async def info_command(message: types.Message):
 
 
 @rights_required(["root", "admin", "moder"], self_only_rights=["moder"])
-async def edit_param_callback(callback: types.CallbackQuery):
+async def edit_param_callback(callback: types.CallbackQuery, user_context: UserContext):
     """Обработка нажатия на кнопку редактирования параметра."""
     try:
         data = (callback.data or "").split(":")
@@ -120,7 +120,7 @@ async def edit_param_callback(callback: types.CallbackQuery):
         current_user = callback.from_user.username or str(callback.from_user.id)
 
         # Проверка прав
-        if not check_edit_permission(current_user, target_username):
+        if not await check_edit_permission(current_user, target_username, current=user_context):
             return await callback.answer(NO_EDITING_RIGHTS, show_alert=True)
 
         delete_after = []
@@ -157,9 +157,17 @@ async def edit_param_callback(callback: types.CallbackQuery):
             msg = await callback.message.answer(ACCESS_SETTINGS, reply_markup=kb.as_markup())
             delete_after.append(msg)
 
+        elif param == "category":
+            # Категория вводится текстом; кнопка открывает inline-подсказки путей в этом же чате
+            await database.set_pending_edit(current_user, param, target_username)
+            kb = InlineKeyboardBuilder()
+            kb.button(text=CHOOSE_CATEGORY_BUTTON, switch_inline_query_current_chat="")
+            msg = await callback.message.answer(EDIT_CATEGORY_PROMPT, parse_mode=None, reply_markup=kb.as_markup())
+            delete_after.append(msg)
+
         else:
             # Обычное текстовое редактирование
-            database.set_pending_edit(current_user, param, target_username)
+            await database.set_pending_edit(current_user, param, target_username)
             msg = await callback.message.answer(
                 EDIT_PROMPT.format(param=param),
                 parse_mode=None
@@ -182,7 +190,7 @@ async def edit_param_callback(callback: types.CallbackQuery):
 
 
 @rights_required(["root", "admin", "moder"], self_only_rights=["moder"])
-async def edit_value_callback(callback: types.CallbackQuery):
+async def edit_value_callback(callback: types.CallbackQuery, user_context: UserContext):
     """Обработка выбора значения (dates, rights, access_until и т.п.)."""
     try:
         data = (callback.data or "").split(":")
@@ -194,13 +202,13 @@ async def edit_value_callback(callback: types.CallbackQuery):
         if data[0] == "edit_value":
             _, param, value, target_username = data
 
-            if not check_edit_permission(current_user, target_username):
+            if not await check_edit_permission(current_user, target_username, current=user_context):
                 return await callback.answer(NO_EDITING_RIGHTS, show_alert=True)
 
             if param == "dates":
                 value = int(value)
 
-            database.update_user_param(target_username, param, value)
+            await database.update_user_param(target_username, param, value)
             confirm = await callback.message.answer(
                 f"Обновили параметр, отчет будет за послдение {value} дней",
                 parse_mode=None
@@ -211,7 +219,7 @@ async def edit_value_callback(callback: types.CallbackQuery):
             _, days, target_username = data
             days = int(days)
 
-            if not check_edit_permission(current_user, target_username):
+            if not await check_edit_permission(current_user, target_username, current=user_context):
                 return await callback.answer(NO_EDITING_RIGHTS, show_alert=True)
 
             if days == -1:
@@ -222,7 +230,7 @@ async def edit_value_callback(callback: types.CallbackQuery):
                 new_date_obj = datetime.today() + timedelta(days=days)
                 new_date = new_date_obj.strftime("%d.%m.%Y")
 
-            database.update_user_param(target_username, "access_until", new_date)
+            await database.update_user_param(target_username, "access_until", new_date)
             confirm = await callback.message.answer(
                 ACCESS_UPDATED.format(username=escape_md(target_username), date=escape_md(new_date)),
                 parse_mode=None
@@ -290,16 +298,9 @@ User:
 • Может вызвать только команду /products
 """
 
-async def cmd_help(message: types.Message):
+async def cmd_help(message: types.Message, user_context: UserContext):
     logger.info(f"📩 /help вызван пользователем @{message.from_user.username}")
-    username = message.from_user.username or str(message.from_user.id)
-    user_data = database.get_user(username)
-
-    if not user_data:
-        await message.answer("❌ Пользователь не найден в базе данных.")
-        return
-
-    rights = user_data.get("rights")
+    rights = user_context.rights
 
     if rights =="root":
         text = HELP_TEXT_ROOT
@@ -0,0 +1,41 @@
+from datetime import date
+from hashlib import md5
+
+from aiogram import Dispatcher, types
+
+from config import logger
+from feature.related_categories.category_searcher import category_searcher
+from middleware.auth_cache import auth_cache
+
+INLINE_RESULTS_LIMIT = 20
+INLINE_CACHE_TIME = 300  # секунд, подсказки кэширует и сам Telegram — только для того же пользователя (is_personal)
+
+
+async def inline_categories(query: types.InlineQuery) -> None:
+    """Подсказки пути категории при вводе "@бот <начало пути>"; ответ строится только из индекса в памяти."""
+    username = query.from_user.username
+    user_context = await auth_cache.get(username) if username else None
+    if user_context is None or not user_context.has_access(date.today()):
+        await query.answer([], cache_time=INLINE_CACHE_TIME, is_personal=True)
+        return
+
+    results = []
+    seen = set()
+    for category in category_searcher.complete(query.query, INLINE_RESULTS_LIMIT):
+        path = category["path"]
+        if path in seen:
+            continue
+        seen.add(path)
+        results.append(types.InlineQueryResultArticle(
+            id=md5(path.encode("utf-8")).hexdigest(),
+            title=path,
+            description=category.get("name") or None,
+            input_message_content=types.InputTextMessageContent(message_text=path, parse_mode=None),
+        ))
+
+    await query.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=True)
+
+
+def setup_inline_categories(dp: Dispatcher) -> None:
+    dp.inline_query.register(inline_categories)
+    logger.info("✅ Подсказки категорий (inline) зарегистрированы")
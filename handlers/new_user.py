@@ -6,7 +6,9 @@ from aiogram.filters import Command
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from config import logger, database
+from middleware.auth_cache import auth_cache
 from middleware.permissions import rights_required, check_edit_permission
+from middleware.user_context import UserContext
 from utils.formatters import escape_md
 from text import *
 
@@ -22,7 +24,7 @@ async def new_user_command(message: types.Message):
 
         new_username = args[1].strip().lstrip("@")
 
-        if database.user_exists(new_username):
+        if await database.user_exists(new_username):
             await message.answer(NEWUSER_ALREADY_EXISTS.format(target_username=escape_md(new_username)), parse_mode=None)
             return
 
@@ -52,7 +54,7 @@ async def new_user_command(message: types.Message):
 
 
 @rights_required(["root"])
-async def create_user_callback(callback: types.CallbackQuery):
+async def create_user_callback(callback: types.CallbackQuery, user_context: UserContext):
     """Обработка выбора срока доступа и создание пользователя + показ info."""
     try:
         parts = (callback.data or "").split(":")
@@ -82,7 +84,7 @@ async def create_user_callback(callback: types.CallbackQuery):
         }
 
         # сохраняем через репозиторий
-        database.add_user(user_data)
+        await database.add_user(user_data)
         logger.info(f"{actor} создал пользователя {username} с доступом до {access_until}")
 
         # удаляем сообщение с кнопками создания (если возможно)
@@ -98,7 +100,7 @@ async def create_user_callback(callback: types.CallbackQuery):
         )
 
         # показываем карточку пользователя (как /info) — используем внутреннюю функцию
-        await _send_info_for_username(callback.message.chat.id, actor, username)
+        await _send_info_for_username(callback.message.chat.id, actor, username, requester=user_context)
 
         # удаляем подтверждение через 3 секунды, чтобы не захламлять чат
         await sleep(3)
@@ -114,18 +116,17 @@ async def create_user_callback(callback: types.CallbackQuery):
         await callback.answer(NEWUSER_CREATION_ERROR, show_alert=True)
 
 
-async def _send_info_for_username(chat_id: int, requester_username: str, target_username: str):
+async def _send_info_for_username(
+    chat_id: int, requester_username: str, target_username: str, requester: UserContext = None
+):
     """
     Собирает текст и клавиатуру как в /info и отправляет в указанный chat_id.
+    requester — уже загруженный контекст requester_username, если он есть.
     """
     # Проверки
-    if not database.user_exists(target_username):
-        await _safe_send(chat_id, NOT_FOUND_IN_THE_DATABASE.format(target_username=escape_md(target_username)), parse_mode=None)
-        return
-
-    user_data = database.get_user(target_username)
+    user_data = await database.get_user(target_username)
     if not user_data:
-        await _safe_send(chat_id, COULDNT_GET_THE_DATA_FOR.format(target_username=escape_md(target_username)), parse_mode=None)
+        await _safe_send(chat_id, NOT_FOUND_IN_THE_DATABASE.format(target_username=escape_md(target_username)), parse_mode=None)
         return
 
     is_self = (target_username == requester_username)
@@ -171,9 +172,10 @@ async def _send_info_for_username(chat_id: int, requester_username: str, target_
 
     # Клавиатура (как в info_command) — показываем кнопки, если requester может редактировать
     kb = InlineKeyboardBuilder()
-    requester = database.get_user(requester_username) or {}
-    requester_rights = requester.get("rights", "user")
-    can_edit = check_edit_permission(requester_username, target_username)
+    if requester is None:
+        requester = await auth_cache.get(requester_username)
+    requester_rights = requester.rights if requester is not None else "user"
+    can_edit = await check_edit_permission(requester_username, target_username, current=requester)
 
     if can_edit:
         if requester_rights == "root":
@@ -1,68 +1,178 @@
-from datetime import datetime, timedelta
+import asyncio
 
 from aiogram import Dispatcher, types, Bot
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
 
-from api.mpstats_api import MpstatsAPI
-from config import logger, database, MAX_TOTAL_PRODUCTS, DATE_FORMAT
+from api.mpstats_api import MpstatsAPIError
+from config import logger, database, MAX_TOTAL_PRODUCTS
+from feature.mpstats.report_admission import AdmissionRejected, report_admission
+from feature.mpstats.report_queue import ReportJob, report_queue
+from feature.mpstats.report_store import ReportStore, report_store
 from feature.mpstats.reports_builder import ProductReportService
-from feature.related_categories.category_searcher import CategorySearcher
+from feature.related_categories.category_searcher import category_searcher
 from middleware.permissions import rights_required
+from middleware.user_context import UserContext
+from utils.progress_message import ProgressMessage
 from text import *
 
 report_service = ProductReportService(database)
 
 
 @rights_required(["root", "admin", "moder", "user"])
-async def products_command(message: types.Message, bot: Bot) -> None:
+async def products_command(message: types.Message, bot: Bot, user_context: UserContext) -> None:
+    """Ставит отчёт в очередь; формирует и отправляет его воркер очереди (run_report_job)."""
     username = message.from_user.username or "unknown_user"
     logger.info(f"Команда /products от {username}")
 
-    processing_msg = await message.answer(REPORT_GENERATION_IN_PROGRESS)
+    # Пользователь уже прочитан из БД в AuthMiddleware
+    user_data = user_context.as_dict()
 
-    user_data = database.get_user(username)
-    if not user_data:
-        logger.warning(f"Пользователь {username} не найден в БД")
-        return None
-
-    days = user_data["dates"]
-    category = user_data["category"]
-    turnover_days_max = user_data["turnover_days_max"]
-    revenue_min = user_data["revenue_min"]
-    now = datetime.now()
-    end_date = (now - timedelta(days=1)).strftime(DATE_FORMAT)
-    start_date = (now - timedelta(days=days)).strftime(DATE_FORMAT)
-
-    searcher = CategorySearcher()
-    await searcher.load()
-
-    results = searcher.search(category)
-    category_count = await MpstatsAPI().get_category_total(
-        start_date, end_date, category, revenue_min, turnover_days_max
-    )
+    if report_queue.active(username):
+        await message.answer(REPORT_ALREADY_QUEUED)
+        return
 
-    if category_count > MAX_TOTAL_PRODUCTS:
-        await message.answer(REPORT_LIMIT_EXCEEDED.format(category_count=category_count))
-        await bot.delete_message(processing_msg.chat.id, processing_msg.message_id)
+    params = report_service.get_report_params(user_data)
+
+    # Категория проверяется по индексу в памяти, без обращения к файлу кэша и к MPStats
+    if category_searcher.is_loaded:
+        category = category_searcher.resolve(params["category"])
+        if category is None:
+            await message.answer(REPORT_UNKNOWN_CATEGORY.format(category=params["category"]), parse_mode=None)
+            return
+        params["category"] = category["path"]
+    else:
+        logger.warning("Индекс категорий не загружен — категория не проверяется")
+
+    # Отчёт с теми же параметрами уже отправлялся сегодня — пересылаем его без очереди
+    if await send_stored_report(message, ReportStore.make_key(params), file_id_only=True):
+        logger.info(f"Отчёт для {username} отправлен из хранилища")
         return
 
-    report_data = await report_service.generate_user_report(username)
+    processing_msg = await message.answer(REPORT_GENERATION_IN_PROGRESS)
+    progress = ProgressMessage(
+        bot, processing_msg.chat.id, processing_msg.message_id, text=REPORT_GENERATION_IN_PROGRESS
+    )
+
+    async def show_position(position: int):
+        # Позиция 1 — отчёт следующий на выполнение
+        text = REPORT_QUEUED.format(position=position) if position > 1 else REPORT_GENERATION_IN_PROGRESS
+        await progress.update(text, force=True)
 
-    if not report_data:
-        await message.answer(REPORT_GENERATION_FAILED)
-        await bot.delete_message(processing_msg.chat.id, processing_msg.message_id)
+    job = ReportJob(
+        username,
+        user_data.get("rights"),
+        lambda job: run_report_job(message, username, params, progress),
+        on_position=show_position
+    )
+    position = report_queue.submit(job)
+    if position is None:
+        await message.answer(REPORT_ALREADY_QUEUED)
+        await progress.delete()
         return
 
-    excel_bytes, caption, filename = report_data
+    logger.info(f"Отчёт для {username} в очереди, позиция {position}")
 
-    await message.answer_document(
-        types.BufferedInputFile(file=excel_bytes, filename=filename),
-        caption=caption
-    )
 
-    await bot.delete_message(processing_msg.chat.id, processing_msg.message_id)
+async def send_stored_report(message: types.Message, key: str, file_id_only: bool = False) -> bool:
+    """
+    Отправляет сохранённый отчёт: по file_id, а если его нет — файлом из хранилища (запоминая file_id).
+    file_id_only — не выгружать файл, только переслать по file_id. Возвращает True, если отчёт отправлен.
+    """
+    stored = await asyncio.to_thread(report_store.get, key)
+    if stored is None:
+        return False
+
+    if stored["file_id"]:
+        try:
+            await message.answer_document(stored["file_id"], caption=stored["caption"])
+            return True
+        except TelegramBadRequest as e:
+            logger.warning(f"file_id сохранённого отчёта не принят Telegram: {e}")
+            await asyncio.to_thread(report_store.set_file_id, key, None)
+
+    if file_id_only or not stored["path"]:
+        return False
+
+    sent = await message.answer_document(
+        types.FSInputFile(stored["path"], filename=stored["filename"]),
+        caption=stored["caption"]
+    )
+    await asyncio.to_thread(report_store.set_file_id, key, sent.document.file_id)
+    return True
+
+
+async def run_report_job(message: types.Message, username: str, params: dict, progress: ProgressMessage) -> None:
+    """Формирует отчёт и отправляет его пользователю, обновляя сообщение о ходе."""
+    key = ReportStore.make_key(params)
+    try:
+        # Сообщение могло показывать позицию в очереди — заменяем её сразу, не дожидаясь первой страницы
+        await progress.update(REPORT_GENERATION_IN_PROGRESS, force=True)
+        # Пока задача ждала в очереди, такой же отчёт мог сформироваться для другого пользователя
+        if await send_stored_report(message, key):
+            return
+
+        try:
+            # Первая страница сразу даёт total; отчёт продолжит загрузку со второй страницы
+            download = await report_service.open_category(params)
+        except MpstatsAPIError as e:
+            logger.error(f"Не удалось получить данные категории для {username}: {e}")
+            await message.answer(REPORT_GENERATION_FAILED)
+            return
+
+        category_count = download.total
+        if category_count > MAX_TOTAL_PRODUCTS:
+            await message.answer(REPORT_LIMIT_EXCEEDED.format(category_count=category_count))
+            return
+
+        async def on_progress(stage: str, pages_loaded: int, pages_total: int):
+            if stage == "loading":
+                await progress.update(REPORT_STAGE_LOADING.format(pages_loaded=pages_loaded, pages_total=pages_total))
+            else:
+                await progress.update(REPORT_STAGE_WRITING, force=True)
+
+        async def on_wait():
+            await progress.update(REPORT_WAITING_FOR_MEMORY, force=True)
+
+        try:
+            # Память под отчёт резервируется по оценке из total; без свободного бюджета отчёт ждёт
+            async with report_admission.admit(username, category_count, on_wait=on_wait):
+                report_data = await report_service.generate_user_report(
+                    username, download, progress=on_progress, params=params
+                )
+        except AdmissionRejected as e:
+            await message.answer(str(e))
+            return
+
+        if not report_data:
+            await message.answer(REPORT_GENERATION_FAILED)
+            return
+
+        report_path, caption, filename = report_data
+        stored_path = None
+
+        try:
+            # Отчёт сохраняется для повторных запросов; слишком большой файл отправляется и удаляется
+            try:
+                stored_path = await asyncio.to_thread(report_store.put, key, report_path, caption, filename)
+            except Exception as e:
+                logger.error(f"Не удалось сохранить отчёт для {username}: {e}")
+
+            await progress.update(REPORT_STAGE_SENDING, force=True)
+            # Файл отправляется с диска по частям, без чтения в память целиком
+            sent = await message.answer_document(
+                types.FSInputFile(stored_path or report_path, filename=filename),
+                caption=caption
+            )
+            if stored_path:
+                await asyncio.to_thread(report_store.set_file_id, key, sent.document.file_id)
+        finally:
+            if stored_path is None:
+                report_service.discard_report(report_path)
+    finally:
+        await progress.delete()
 
 
 def setup(dp: Dispatcher) -> None:
     dp.message.register(products_command, Command("products"))
-    logger.info("✅ Команда /products зарегистрирована")
\ No newline at end of file
+    logger.info("✅ Команда /products зарегистрирована")
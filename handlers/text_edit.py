@@ -1,12 +1,25 @@
 from aiogram import types, Dispatcher
 from config import database
-from text import INCORRECT_FORMAT_FOR, PARAMETER_FOR_UPDATED, NO_EDITING_RIGHTS_USER
+from feature.related_categories.category_searcher import category_searcher
+from middleware.user_context import UserContext
+from text import (
+    INCORRECT_FORMAT_FOR,
+    PARAMETER_FOR_UPDATED,
+    NO_EDITING_RIGHTS_USER,
+    UNKNOWN_CATEGORY,
+    UNKNOWN_CATEGORY_SUGGESTIONS,
+)
 
+CATEGORY_SUGGESTIONS_LIMIT = 5
 
-async def handle_text_edit(message: types.Message):
+
+async def handle_text_edit(message: types.Message, user_context: UserContext = None):
     current_user = message.from_user.username or str(message.from_user.id)
 
-    pending = database.get_pending_edit(current_user)
+    if not message.text:
+        return
+
+    pending = await database.get_pending_edit(current_user)
     if not pending:
         return
 
@@ -14,9 +27,9 @@ async def handle_text_edit(message: types.Message):
     target_username = pending['target']
 
     from middleware.permissions import check_edit_permission
-    if not check_edit_permission(current_user, target_username):
+    if not await check_edit_permission(current_user, target_username, current=user_context):
         await message.answer(NO_EDITING_RIGHTS_USER)
-        database.clear_pending_edit(current_user)
+        await database.clear_pending_edit(current_user)
         return
 
     value = message.text.strip()
@@ -34,30 +47,38 @@ async def handle_text_edit(message: types.Message):
         parts = [p.strip() for p in value.split("/")]
         value = "/".join(parts)
 
-    if param == "turnover_days_max":
-        database.update_user_param(target_username, param, value)
-        await message.answer(f"Обновили параметр оборачиваемости до {value} дней")
-        return
-
-    if param == "revenue_min":
-        database.update_user_param(target_username, param, value)
-        await message.answer(f"Обновили минимальную выручку от {value} рублей")
-        return
-
-    if param == "percent":
-        database.update_user_param(target_username, param, value)
-        await message.answer(f"Обновили процент падение остатков до {value}%")
-        return
+        # Сохраняется только существующий путь MPStats, чтобы отчёт не запускался по опечатке.
+        # Если индекс категорий не загружен, проверить нечем — значение принимается как есть
+        if category_searcher.is_loaded:
+            category = category_searcher.resolve(value)
+            if category is None:
+                suggestions = category_searcher.search(value, CATEGORY_SUGGESTIONS_LIMIT)
+                if suggestions:
+                    text = UNKNOWN_CATEGORY_SUGGESTIONS.format(
+                        category=value,
+                        suggestions="\n".join(c["path"] for c in suggestions)
+                    )
+                else:
+                    text = UNKNOWN_CATEGORY.format(category=value)
+                await message.answer(text, parse_mode=None)
+                return
+            value = category["path"]
 
-    if param == "category":
-        database.update_user_param(target_username, param, value)
-        await message.answer(f"Обновили категорию - {value}")
-        return
-
-    database.update_user_param(target_username, param, value)
-    await message.answer(PARAMETER_FOR_UPDATED.format(param=param, value=value))
+    await database.update_user_param(target_username, param, value)
+    # Правка завершена — следующее сообщение пользователя уже не считается вводом значения
+    await database.clear_pending_edit(current_user)
 
-    database.clear_pending_edit(current_user)
+    if param == "turnover_days_max":
+        text = f"Обновили параметр оборачиваемости до {value} дней"
+    elif param == "revenue_min":
+        text = f"Обновили минимальную выручку от {value} рублей"
+    elif param == "percent":
+        text = f"Обновили процент падение остатков до {value}%"
+    elif param == "category":
+        text = f"Обновили категорию - {value}"
+    else:
+        text = PARAMETER_FOR_UPDATED.format(param=param, value=value)
+    await message.answer(text)
 
 def setup_handle_text_edit(dp: Dispatcher):
     dp.message.register(handle_text_edit)
\ No newline at end of file
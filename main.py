@@ -1,15 +1,44 @@
 import asyncio
 from aiogram import Dispatcher
-from config import bot
+from api.http_session import session_pool
+from api.response_cache import response_cache
+from config import bot, logger, database, PENDING_EDIT_SWEEP_INTERVAL
+from feature.mpstats.report_queue import report_queue
+from feature.mpstats.report_store import report_store
+from feature.mpstats.reports_builder import ProductReportService
+from feature.related_categories.category_searcher import category_searcher
 from middleware.auth_middleware import AuthMiddleware
+from utils.cpu_pool import cpu_pool
 import handlers
 
 
+async def on_startup() -> None:
+    await session_pool.start()
+    cpu_pool.start()
+    database.start(PENDING_EDIT_SWEEP_INTERVAL)
+    ProductReportService.cleanup_stale_reports()
+    await asyncio.to_thread(report_store.cleanup)
+    report_queue.start()
+    await category_searcher.load()
+
+
+async def on_shutdown() -> None:
+    await report_queue.close()
+    await session_pool.close()
+    cpu_pool.close()
+    database.close()
+    logger.info(f"🗄 Кэш MPStats: {response_cache.stats}, hit ratio {response_cache.hit_ratio():.2f}")
+    logger.info(f"🗄 Хранилище отчётов: {report_store.stats}")
+
+
 async def main() -> None:
     dp = Dispatcher()
     dp.message.middleware.register(AuthMiddleware())
     handlers.setup(dp)
 
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+
     await dp.start_polling(bot)
 
     # Если у тебя есть async-генерация отчетов, можно логировать прямо там
@@ -0,0 +1,61 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from config import database, AUTH_CACHE_TTL, AUTH_NEGATIVE_CACHE_SIZE, AUTH_NEGATIVE_CACHE_TTL
+from middleware.user_context import UserContext
+
+
+class AuthCache:
+    """
+    Кэш решений авторизации по username: готовый UserContext (права и разобранная дата доступа)
+    для известных пользователей и небольшой LRU-список неизвестных, чтобы спам от
+    незарегистрированных не доходил до БД. Записи сбрасываются подпиской на изменения
+    в репозитории (add_user / update_user_param), а изменения из других процессов бота
+    подхватываются по истечении ttl / negative_ttl.
+    """
+
+    def __init__(self, repository, ttl: float = AUTH_CACHE_TTL, negative_size: int = AUTH_NEGATIVE_CACHE_SIZE,
+                 negative_ttl: float = AUTH_NEGATIVE_CACHE_TTL):
+        self.repository = repository
+        self.ttl = ttl
+        self.negative_size = negative_size
+        self.negative_ttl = negative_ttl
+        self._users: Dict[str, Tuple[UserContext, float]] = {}  # username -> (контекст, когда перечитать)
+        self._unknown: OrderedDict[str, float] = OrderedDict()  # username -> когда перепроверить
+        repository.add_change_listener(self.invalidate)
+
+    async def get(self, username: str) -> Optional[UserContext]:
+        """Контекст пользователя или None, если его нет в БД."""
+        entry = self._users.get(username)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+
+        retry_at = self._unknown.get(username)
+        if retry_at is not None:
+            if retry_at > time.monotonic():
+                return None
+            del self._unknown[username]
+
+        user_data = await self.repository.get_user(username)
+        if not user_data:
+            self._users.pop(username, None)
+            self._remember_unknown(username)
+            return None
+        context = UserContext.from_row(user_data)
+        self._users[username] = (context, time.monotonic() + self.ttl)
+        return context
+
+    def invalidate(self, username: str):
+        self._users.pop(username, None)
+        self._unknown.pop(username, None)
+
+    def _remember_unknown(self, username: str):
+        # Неизвестные хранятся недолго: пользователя могли добавить в другом процессе бота
+        self._unknown[username] = time.monotonic() + self.negative_ttl
+        self._unknown.move_to_end(username)
+        while len(self._unknown) > self.negative_size:
+            self._unknown.popitem(last=False)
+
+
+auth_cache = AuthCache(database)
@@ -1,13 +1,14 @@
 from typing import Awaitable, Callable, Dict, Any
 from aiogram import types
-from database.user_repository import UserRepository
 from config import logger
 from datetime import datetime
+from middleware.auth_cache import auth_cache
 from text import *
 
 class AuthMiddleware:
     def __init__(self):
-        self.user_repo = UserRepository()
+        # Решения по пользователям кэшируются и сбрасываются при их изменении в репозитории
+        self.auth_cache = auth_cache
 
     async def __call__(
         self,
@@ -34,31 +35,25 @@ class AuthMiddleware:
             await event.answer(AUTH_NO_USERNAME)
             return
 
-        # === Проверка, есть ли пользователь в БД ===
-        if not self.user_repo.user_exists(user.username):
+        # === Проверка, есть ли пользователь в БД (из кэша авторизации) ===
+        user_context = await self.auth_cache.get(user.username)
+        if user_context is None:
             logger.warning("Unauthorized access attempt", extra={"context": log_context})
             await event.answer(AUTH_NOT_REGISTERED)
             return
 
-        # === Проверка срока доступа ===
-        user_data = self.user_repo.get_user(user.username)
-        access_until = user_data.get("access_until", "01.01.2000")
-
-        try:
-            access_date = datetime.strptime(access_until, "%d.%m.%Y").date()
-        except ValueError:
-            access_date = datetime(2000, 1, 1).date()  # fallback
-
+        # === Проверка срока доступа (дата уже разобрана) ===
         today = datetime.today().date()
 
-        if access_date < today:
+        if not user_context.has_access(today):
             logger.warning(
-                f"Access denied — expired ({access_until})",
+                f"Access denied — expired ({user_context.access_until})",
                 extra={"context": log_context}
             )
             await event.answer(AUTH_ACCESS_EXPIRED)
             return
 
-        # === Всё ок — продолжаем ===
+        # === Всё ок — продолжаем; хэндлеры получают пользователя из data ===
+        data["user_context"] = user_context
         logger.info("Successful access", extra={"context": log_context})
         return await handler(event, data)
\ No newline at end of file
@@ -1,6 +1,8 @@
 import inspect
 from aiogram import types
 from config import logger, database
+from middleware.auth_cache import auth_cache
+from middleware.user_context import UserContext
 from text import *
 
 
@@ -22,17 +24,20 @@ def rights_required(allowed_rights: list, self_only_rights: list = None):
 
             username = user.username or str(user.id)
 
-            # 🗄 Проверяем, есть ли пользователь в БД
-            user_data = database.get_user(username)
-            if not user_data:
-                await message.answer(
-                    RIGHTS_USER_NOT_FOUND.format(username=username),
-                    parse_mode=None
-                )
-                logger.warning(f"Пользователь {username} не найден в БД.")
-                return
+            # 🗄 Пользователь уже загружен AuthMiddleware; для callback-запросов — из кэша авторизации
+            user_context = kwargs.get("user_context")
+            if user_context is None:
+                user_context = await auth_cache.get(username)
+                if user_context is None:
+                    await message.answer(
+                        RIGHTS_USER_NOT_FOUND.format(username=username),
+                        parse_mode=None
+                    )
+                    logger.warning(f"Пользователь {username} не найден в БД.")
+                    return
+                kwargs["user_context"] = user_context
 
-            user_rights = user_data.get("rights")
+            user_rights = user_context.rights
 
             # 🚫 Проверяем права
             if user_rights not in allowed_rights:
@@ -71,26 +76,29 @@ def rights_required(allowed_rights: list, self_only_rights: list = None):
         return wrapper
     return decorator
 
-def check_edit_permission(current_user: str, target_username: str) -> bool:
+async def check_edit_permission(current_user: str, target_username: str, current: UserContext = None) -> bool:
     """
     Проверяет, имеет ли current_user право редактировать target_username.
+    current — уже загруженный контекст current_user (из data["user_context"]), чтобы не читать его повторно.
     """
-    current = database.get_user(current_user)
-    target = database.get_user(target_username)
+    if current is None:
+        current = await auth_cache.get(current_user)
+    current_rights = current.rights if current is not None else None
+    target = await database.get_user(target_username)
 
-    if not current or not target:
+    if not current_rights or not target:
         return False
 
     # root может всех
-    if current["rights"] == "root":
+    if current_rights == "root":
         return True
 
     # admin может moder и user
-    if current["rights"] == "admin" and target["rights"] in ("moder", "user"):
+    if current_rights == "admin" and target["rights"] in ("moder", "user"):
         return True
 
     # moder может только user
-    if current["rights"] == "moder" and target["rights"] == "user":
+    if current_rights == "moder" and target["rights"] == "user":
         return True
 
     # user — только себя
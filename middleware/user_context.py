@@ -0,0 +1,50 @@
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Optional
+
+NO_ACCESS_DATE = date(2000, 1, 1)
+
+
+@dataclass(frozen=True)
+class UserContext:
+    """
+    Пользователь, от которого пришло обновление. Загружается один раз в AuthMiddleware
+    и передаётся хэндлерам через data["user_context"], чтобы не перечитывать его из БД.
+    """
+    username: str
+    rights: str
+    dates: int
+    turnover_days_max: int
+    revenue_min: int
+    category: str
+    percent: float
+    access_until: Optional[str]
+    # Разобранная access_until: срок доступа проверяется на каждом обновлении без strptime
+    access_date: date = field(default=NO_ACCESS_DATE, compare=False)
+
+    @classmethod
+    def from_row(cls, user_data: dict) -> "UserContext":
+        return cls(
+            **{name: user_data.get(name) for name in USER_ROW_FIELDS},
+            access_date=parse_access_date(user_data.get("access_until"))
+        )
+
+    def as_dict(self) -> dict:
+        """Словарь в формате UserRepository.get_user — для кода, который работает со строкой БД."""
+        return {name: getattr(self, name) for name in USER_ROW_FIELDS}
+
+    def has_access(self, today: date) -> bool:
+        return self.access_date >= today
+
+
+USER_ROW_FIELDS = (
+    "username", "rights", "dates", "turnover_days_max", "revenue_min", "category", "percent", "access_until"
+)
+
+
+def parse_access_date(access_until: Optional[str]) -> date:
+    """Дата окончания доступа; пустая или некорректная дата означает, что доступа нет."""
+    try:
+        return datetime.strptime(access_until or "", "%d.%m.%Y").date()
+    except ValueError:
+        return NO_ACCESS_DATE  # fallback
@@ -51,6 +51,10 @@ USER_INFO = """{header}
 
 # Подсказки для редактирования
 EDIT_PROMPT = "✏️ Введите новое значение для {param}:"
+EDIT_CATEGORY_PROMPT = "✏️ Введите путь категории, например: Женщинам/Одежда/Платья\nИли нажмите кнопку ниже и начните вводить — бот подскажет варианты."
+CHOOSE_CATEGORY_BUTTON = "🔎 Подобрать категорию"
+UNKNOWN_CATEGORY = "❌ Категория «{category}» не найдена."
+UNKNOWN_CATEGORY_SUGGESTIONS = "❌ Категория «{category}» не найдена. Возможно, вы имели в виду:\n{suggestions}"
 CHOOSE_DAYS = "📅 Отчет за послдение:"
 CHOOSE_RIGHTS = "🛠 Выберите права:"
 ACCESS_SETTINGS = "🔑 Настройка доступа:"
@@ -76,6 +80,15 @@ ACCESS_UNTIL = "🔑 Доступ до"
 REPORT_GENERATION_IN_PROGRESS = "⏳ Формируем отчёт..."
 REPORT_GENERATION_FAILED = "❌ Не удалось сформировать отчёт"
 REPORT_LIMIT_EXCEEDED = "Превышены лимиты, товаров в запросе - {category_count}.\nИзмени параметры запроса либо сузь категорию"
+REPORT_UNKNOWN_CATEGORY = "❌ Категория «{category}» не найдена в MPStats.\nПроверь путь категории в настройках"
+REPORT_QUEUED = "⏳ Отчёт в очереди, позиция: {position}"
+REPORT_ALREADY_QUEUED = "⏳ Твой отчёт уже формируется — дождись его, прежде чем запрашивать новый"
+REPORT_TOO_LARGE = "Отчёт по {category_count} товарам не поместится в память бота.\nИзмени параметры запроса либо сузь категорию"
+REPORT_WAITING_FOR_MEMORY = "⏳ Сейчас формируются другие большие отчёты — твой начнётся, как только освободится память..."
+REPORT_ADMISSION_TIMED_OUT = "❌ Бот сейчас перегружен отчётами, попробуй ещё раз через несколько минут"
+REPORT_STAGE_LOADING = "📡 Загружаем данные MPStats...\nСтраниц: {pages_loaded} из {pages_total}"
+REPORT_STAGE_WRITING = "📝 Формируем файл отчёта..."
+REPORT_STAGE_SENDING = "📤 Отправляем отчёт..."
 
 # Новые переменные для new_user.py
 NEWUSER_MISSING_USERNAME = "❌ Укажите имя пользователя: /newuser username"
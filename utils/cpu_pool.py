@@ -0,0 +1,66 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+
+from config import logger, CPU_POOL_KIND, CPU_POOL_WORKERS
+
+
+class CpuPool:
+    """
+    Общий для процесса пул для CPU-тяжёлых этапов (разбор страниц MPStats),
+    чтобы они не блокировали event loop бота.
+    kind="process" — ProcessPoolExecutor: аргументы и результат передаются между процессами,
+    поэтому функции должны быть на уровне модуля, а данные — компактными (байты ответа, массивы NumPy).
+    Воркеры запускаются через forkserver, а не fork: процесс бота уже держит потоки
+    (aiohttp, sqlite, to_thread), и их блокировки не должны копироваться в дочерние процессы.
+    Если воркер погиб (например, убит OOM killer), пул пересоздаётся, а задача повторяется один раз.
+    kind="thread" — ThreadPoolExecutor: без сериализации, но выигрыш только там, где код отпускает GIL.
+    """
+
+    def __init__(self, kind: str = CPU_POOL_KIND, workers: int = CPU_POOL_WORKERS):
+        if kind not in ("process", "thread"):
+            raise ValueError(f"Неизвестный тип пула: {kind}")
+        self.kind = kind
+        self.workers = workers
+        self._executor: Optional[Executor] = None
+
+    def start(self) -> Executor:
+        """Создаёт пул, если он ещё не создан."""
+        if self._executor is None:
+            if self.kind == "process":
+                context = multiprocessing.get_context("forkserver")
+                # Разбор страниц импортируется один раз в forkserver, а не в каждом воркере
+                context.set_forkserver_preload(["api.mpstats_module"])
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="cpu")
+            logger.info(f"🧮 CPU-пул запущен ({self.kind}, workers={self.workers})")
+        return self._executor
+
+    async def run(self, func: Callable, *args):
+        """Выполняет func(*args) в пуле и ждёт результат, не блокируя event loop."""
+        loop = asyncio.get_running_loop()
+        executor = self.start()
+        try:
+            return await loop.run_in_executor(executor, func, *args)
+        except BrokenProcessPool:
+            logger.warning("🧮 Воркер CPU-пула завершился аварийно, пул пересоздаётся")
+            self._discard(executor)
+            return await loop.run_in_executor(self.start(), func, *args)
+
+    def _discard(self, executor: Executor):
+        """Убирает сломанный пул; параллельные задачи, упавшие вместе с ним, не трогают уже новый."""
+        if self._executor is executor:
+            self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            logger.info("🧮 CPU-пул остановлен")
+
+
+cpu_pool = CpuPool()
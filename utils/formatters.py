@@ -1,5 +1,6 @@
 import re
 from datetime import datetime
+from functools import lru_cache
 from config import DATE_FORMAT
 
 
@@ -8,9 +9,8 @@ def format_currency(value: float) -> str:
     return f"{int(value):,} ₽".replace(",", " ") if value > 0 else "Нет данных"
 
 
-def get_turnover_value(raw_data: dict) -> str:
+def get_turnover_value(turnover_days) -> str:
     """Возвращает значение оборачиваемости."""
-    turnover_days = raw_data.get("turnover_days")
     return f"{int(turnover_days)} дн." if turnover_days else "Н/Д"
 
 
@@ -19,10 +19,16 @@ def get_wb_link(product_id: int) -> str:
     return f"https://www.wb.ru/catalog/{product_id}/detail.aspx"
 
 
+@lru_cache(maxsize=64)
+def _to_mpstats_date(date: str) -> str:
+    """Переводит дату из DATE_FORMAT в формат ссылок MPStats (дд.мм.гггг)."""
+    return datetime.strptime(date, DATE_FORMAT).strftime("%d.%m.%Y")
+
+
 def build_mpstats_link(product_id: int, start_date: str, end_date: str) -> str:
     """Формирует ссылку на MPStats."""
-    start_fmt = datetime.strptime(start_date, DATE_FORMAT).strftime("%d.%m.%Y")
-    end_fmt = datetime.strptime(end_date, DATE_FORMAT).strftime("%d.%m.%Y")
+    start_fmt = _to_mpstats_date(start_date)
+    end_fmt = _to_mpstats_date(end_date)
     return f"https://mpstats.io/wb/item/{product_id}?d1={start_fmt}&d2={end_fmt}"
 
 def format_revenue(amount: int) -> str:
@@ -0,0 +1,47 @@
+import time
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+
+from config import logger, REPORT_PROGRESS_INTERVAL
+
+
+class ProgressMessage:
+    """
+    Служебное сообщение о ходе долгой операции.
+    Правки не чаще раза в interval секунд (Telegram ограничивает частоту edit_message_text),
+    одинаковый текст повторно не отправляется.
+    """
+
+    def __init__(
+            self,
+            bot: Bot,
+            chat_id: int,
+            message_id: int,
+            interval: float = REPORT_PROGRESS_INTERVAL,
+            text: str = None
+    ):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.interval = interval
+        self._text = text  # текущий текст сообщения
+        self._edited_at = 0.0
+
+    async def update(self, text: str, force: bool = False):
+        """Меняет текст сообщения; без force промежуточные обновления чаще interval пропускаются."""
+        now = time.monotonic()
+        if text == self._text or (not force and now - self._edited_at < self.interval):
+            return
+        self._text = text
+        self._edited_at = now
+        try:
+            await self.bot.edit_message_text(text, chat_id=self.chat_id, message_id=self.message_id)
+        except TelegramBadRequest as e:
+            logger.debug(f"Не удалось обновить сообщение о ходе: {e}")
+
+    async def delete(self):
+        try:
+            await self.bot.delete_message(self.chat_id, self.message_id)
+        except TelegramBadRequest as e:
+            logger.debug(f"Не удалось удалить сообщение о ходе: {e}")